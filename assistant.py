@@ -0,0 +1,107 @@
+from conversation import compact_messages, estimate_tokens
+from dispatch import run_tool_calls
+from llm import client as llm_client
+from response_cache import response_cache
+from router import has_missing_values, render_answer, route
+from tools import available_function, functions, tools
+from tracing import span
+
+
+# Parallel tool calls need a model from the tools API generation, 0613 only returns a single function_call.
+MODEL = 'gpt-3.5-turbo-0125'
+
+
+# One streamed completion over the compacted history, recorded as a span with its token counts.
+# Prompt tokens are estimated, completion tokens are the streamed chunks.
+def _complete(llm, stage, messages, ui, **kwargs):
+    compacted = compact_messages(messages)
+    with span(stage, model=MODEL, prompt_tokens=sum(estimate_tokens(message) for message in compacted)) as current:
+        message, stats = llm.stream_chat(compacted, on_token=ui.stream(), model=MODEL, **kwargs)
+        current.set(completion_tokens=stats.get('chunks'), ttft_ms=None if stats['ttft'] is None else stats['ttft'] * 1000,
+                    tool_calls=len(message.get('tool_calls') or []))
+    return message, stats
+
+
+# Runs one assistant turn for a session. `messages` is that session's history and is extended in
+# place; everything else used here (LLM client, caches, tool pool) is shared by the whole process.
+# Output goes through `ui`, which needs stream() returning a token callback for a fresh output area,
+# text(), image() and error(); the Streamlit app and the load test plug in their own.
+# Returns the answer text (None for chart-only turns) and the time to the first streamed token.
+def run_turn(messages, user_input, ui, llm=llm_client):
+    messages.append({'role':'user', 'content': f'{user_input}'})
+
+    ttft = None
+    answer = None
+    results = None
+    response_message = None
+
+    # Plain indicator questions are resolved locally and answered from templates, without the model.
+    # If any routed call fails (say a misread ticker) or comes back without a value for some ticker,
+    # the model gets the question instead.
+    with span('route') as current:
+        tool_calls = route(user_input, functions)
+        current.set(routed=bool(tool_calls))
+    if tool_calls:
+        with span('tools', calls=len(tool_calls)):
+            results = run_tool_calls(tool_calls, available_function, functions)
+        if any(result.error for result in results) or has_missing_values(results):
+            tool_calls = results = None
+        else:
+            answer = render_answer(tool_calls, results)
+
+    # A question asked before with the same wording reuses the tool calls chosen back then.
+    if not tool_calls:
+        with span('plan_cache') as current:
+            tool_calls = response_cache.get_plan(user_input)
+            current.set(cache_hit=tool_calls is not None)
+
+    if tool_calls is None:
+        # Both completions are streamed through the shared async client, tokens show up as they arrive.
+        # Only a compacted view of the history is sent, older turns go out as short facts.
+        response_message, stats = _complete(llm, 'completion.tools', messages, ui, tools=tools, tool_choice='auto')
+        ttft = stats['ttft']
+        tool_calls = response_message.get('tool_calls')
+        if tool_calls:
+            response_cache.put_plan(user_input, tool_calls)
+
+    if tool_calls:
+        # All tool calls of the response run concurrently, the turn takes as long as the slowest one.
+        if results is None:
+            with span('tools', calls=len(tool_calls)):
+                results = run_tool_calls(tool_calls, available_function, functions)
+
+        for result in results:
+            if result.error:
+                ui.error(result.error)
+            elif result.name == 'plot_stock_price':
+                ui.image(result.content)
+
+        if any(result.name != 'plot_stock_price' for result in results):
+            messages.append({'role': 'assistant', 'content': None, 'tool_calls': tool_calls})
+            for result in results:
+                messages.append(
+                    {
+                        'role': 'tool',
+                        'tool_call_id': result.id,
+                        'name': result.name,
+                        'content': result.error or ('The chart was shown to the user.' if result.name == 'plot_stock_price' else result.content),
+                    }
+                )
+            # Same question and same numbers as a recent turn: reuse that answer.
+            if answer is None:
+                with span('answer_cache') as current:
+                    answer = response_cache.get_answer(user_input, results)
+                    current.set(cache_hit=answer is not None)
+            if answer is not None:
+                ui.text(answer)
+            else:
+                second_message, stats = _complete(llm, 'completion.answer', messages, ui)
+                ttft = stats['ttft']
+                answer = second_message['content']
+                response_cache.put_answer(user_input, results, answer)
+            messages.append({'role': 'assistant', 'content': answer})
+    else:
+        answer = response_message['content']
+        messages.append({'role': 'assistant', 'content': answer})
+
+    return answer, ttft
@@ -0,0 +1,153 @@
+import itertools
+import os
+
+import numpy as np
+
+from indicators import compute_indicators, ema, sma
+from market_data import get_close_matrix
+from tracing import span
+
+
+# Long-only backtests of indicator strategies over whole histories. Everything is array based: the
+# indicators are computed once for all tickers (columns of one price matrix), each parameter
+# combination turns them into a position matrix and the statistics are reductions over its rows.
+# SMAs, signals and statistics have no loop over bars; the EMA, RSI and MACD recursions
+# (indicators.ewm) step through the bars, in pandas' compiled ewm or, for wide matrices, a NumPy loop
+# vectorized across tickers. Positions are taken at the close of the bar that signals and earn the
+# next bar's return, so there is no look-ahead. No costs.
+STRATEGIES = {
+    # strategy: (parameter defaults, a valid combination)
+    'sma_cross': ({'fast': [50], 'slow': [200]}, lambda fast, slow: fast < slow),
+    'ema_cross': ({'fast': [12], 'slow': [26]}, lambda fast, slow: fast < slow),
+    'rsi_bands': ({'lower': [30], 'upper': [70]}, lambda lower, upper: lower < upper),
+    'macd_cross': ({}, lambda: True),
+}
+# A sweep is capped so that a single tool call stays within one chat turn.
+MAX_COMBINATIONS = int(os.environ.get('BACKTEST_MAX_COMBINATIONS', 200))
+
+
+# Last valid value carried forward down each column, NaN before the first one.
+def _hold(events):
+    rows = np.arange(len(events))[:, None]
+    last = np.maximum.accumulate(np.where(np.isnan(events), 0, rows), axis=0)
+    return np.take_along_axis(events, last, axis=0)
+
+
+# In the market (1) or out (0) at the close of every bar, per ticker.
+def _signal(strategy, indicators, parameters):
+    with np.errstate(invalid='ignore'):
+        if strategy in ('sma_cross', 'ema_cross'):
+            averages = indicators['sma' if strategy == 'sma_cross' else 'ema']
+            return averages[parameters['fast']] > averages[parameters['slow']]
+        if strategy == 'macd_cross':
+            return indicators['macd'] > indicators['signal']
+        # RSI bands: buy once oversold, stay in until overbought.
+        rsi = indicators['rsi']
+        events = np.where(rsi < parameters['lower'], 1.0, np.where(rsi > parameters['upper'], 0.0, np.nan))
+        return np.nan_to_num(_hold(events)) > 0
+
+
+# Compounded statistics of holding `position` (0/1 per bar and ticker) over the bar returns. `listed`
+# marks the bars from each ticker's first price on; `years` and `bars_per_year` are per ticker too, so
+# a ticker listed partway through is measured over its own history, not the padded rows before it.
+def _statistics(position, returns, listed, years, bars_per_year):
+    exposure = np.vstack([np.zeros((1, position.shape[1])), position[:-1]]) * listed
+    strategy_returns = exposure * returns
+    equity = np.cumprod(1 + strategy_returns, axis=0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+    bars = listed.sum(axis=0)
+    mean = strategy_returns.sum(axis=0) / bars
+    deviation = np.sqrt((((strategy_returns - mean) * listed) ** 2).sum(axis=0) / bars)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sharpe = np.where(deviation > 0, mean / deviation * np.sqrt(bars_per_year), np.nan)
+    return {
+        'CAGR': equity[-1] ** (1 / years) - 1,
+        'total_return': equity[-1] - 1,
+        'max_drawdown': drawdown.min(axis=0),
+        'sharpe': sharpe,
+        'trades': (np.diff(exposure, axis=0) > 0).sum(axis=0),
+        'exposure': exposure.sum(axis=0) / bars,
+    }
+
+
+def _combinations(strategy, parameters):
+    defaults, valid = STRATEGIES[strategy]
+    grid = {name: sorted(set(parameters.get(name) or default)) for name, default in defaults.items()}
+    combinations = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    combinations = [combination for combination in combinations if valid(**combination)]
+    if not combinations:
+        raise ValueError(f'No valid parameter combination for {strategy}: {grid}')
+    if len(combinations) > MAX_COMBINATIONS:
+        raise ValueError(f'{len(combinations)} parameter combinations requested, at most {MAX_COMBINATIONS} are allowed.')
+    return combinations
+
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+# Runs `strategy` for every ticker and every combination of the given parameter lists (fast/slow windows
+# for the crosses, lower/upper RSI levels for the bands) and reports, per ticker, the combination with
+# the best Sharpe ratio next to buy and hold. Tickers are ranked by that Sharpe ratio.
+def backtest(tickers, strategy, period='5y', limit=20, **parameters):
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown strategy: {strategy}. Use one of {", ".join(STRATEGIES)}.')
+    combinations = _combinations(strategy, parameters)
+
+    close = get_close_matrix(tickers, period=period)
+    close = close.loc[:, close.notna().any()]
+    if len(close) < 3:
+        raise ValueError(f'Not enough price data for {", ".join(tickers)}.')
+    prices = close.to_numpy()
+    returns = np.nan_to_num(prices[1:] / prices[:-1] - 1)
+    returns = np.vstack([np.zeros((1, prices.shape[1])), returns])
+    # Shorter histories are NaN-padded at the top of the matrix (see get_close_matrix).
+    listed = ~np.isnan(prices)
+    first = listed.argmax(axis=0)
+    days = (close.index[-1] - close.index[first]).days.to_numpy()
+    years = np.maximum(days / 365.25, 1 / 365.25)
+    bars_per_year = listed.sum(axis=0) / years
+
+    with span('indicators', bars=prices.shape[0], columns=prices.shape[1]):
+        windows = sorted({value for combination in combinations for name, value in combination.items() if name in ('fast', 'slow')})
+        if strategy == 'sma_cross':
+            indicators = {'sma': {window: sma(prices, window) for window in windows}}
+        elif strategy == 'ema_cross':
+            indicators = {'ema': {window: ema(prices, window) for window in windows}}
+        else:
+            indicators = compute_indicators(prices)
+
+    with span('backtest', strategy=strategy, combinations=len(combinations), tickers=prices.shape[1]):
+        best = None
+        for number, combination in enumerate(combinations):
+            result = _statistics(_signal(strategy, indicators, combination).astype(float), returns, listed, years, bars_per_year)
+            sharpe = np.nan_to_num(result['sharpe'], nan=-np.inf)
+            if best is None:
+                best, best_sharpe, best_combination = result, sharpe, np.zeros(prices.shape[1], dtype=int)
+                continue
+            better = sharpe > best_sharpe
+            best = {name: np.where(better, result[name], best[name]) for name in best}
+            best_sharpe = np.where(better, sharpe, best_sharpe)
+            best_combination[better] = number
+        hold = _statistics(np.ones_like(prices), returns, listed, years, bars_per_year)
+
+    order = np.argsort(-best_sharpe, kind='stable')
+    return {
+        'strategy': strategy,
+        'period': f'{close.index[0]:%Y-%m-%d} to {close.index[-1]:%Y-%m-%d}',
+        'bars': len(close),
+        'combinations_tested': len(combinations),
+        'tickers_tested': prices.shape[1],
+        'beat_buy_and_hold': int((best['CAGR'] > hold['CAGR']).sum()),
+        'results': [
+            {
+                'ticker': close.columns[column],
+                'parameters': combinations[best_combination[column]],
+                **{name: _round(best[name][column]) for name in ('CAGR', 'max_drawdown', 'sharpe', 'exposure')},
+                'trades': int(best['trades'][column]),
+                'buy_and_hold_CAGR': _round(hold['CAGR'][column]),
+                'buy_and_hold_max_drawdown': _round(hold['max_drawdown'][column]),
+            }
+            for column in order[:limit]
+        ],
+    }
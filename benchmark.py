@@ -0,0 +1,210 @@
+# Benchmark for the tool functions and for a full chat turn, on synthetic market data and a stub LLM,
+# so it needs neither an API key nor network access.
+#
+#   python benchmark.py --json bench.json
+#   python benchmark.py --json bench-new.json --baseline bench.json
+#
+# Every tool in available_function is timed on each series shape (1y and 10y of daily bars, a month of
+# minute bars); the batch tools also over 1 to 500 tickers. Tool timings are warm: the history is
+# already cached, so they measure the indicator math, JSON encoding and chart rendering. --cold clears
+# the history cache before every call to include the data layer as well. Results are written as JSON
+# with p50/p90/p99/mean per case, and --baseline prints the ratio against an earlier run.
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import string
+import subprocess
+import sys
+import time
+
+os.environ['HISTORY_STORE_DIR'] = ''  # keep the benchmark off the on-disk store
+
+import numpy as np
+import pandas as pd
+
+import market_data
+from assistant import run_turn
+from charts import chart_cache
+from loadtest import QUESTIONS, RecordingUI, StubLLM
+from providers import SyntheticProvider
+from response_cache import response_cache
+from tools import available_function, functions
+
+
+# Series shapes: (period, interval) the synthetic provider serves whatever the tools ask for.
+SHAPES = {
+    '1y_daily': ('1y', '1d'),
+    '10y_daily': ('10y', '1d'),
+    '1mo_minute': ('1mo', '1m'),
+}
+TICKER_COUNTS = [1, 10, 100, 500]
+# Letter-only symbols, enough for any --tickers count up to 26 ** 3.
+TICKERS = [f'B{first}{second}{third}' for first in string.ascii_uppercase
+           for second in string.ascii_uppercase for third in string.ascii_uppercase]
+WINDOW = 20
+CONDITIONS = 'RSI < 50 and price above SMA(20)'
+STRATEGY = 'sma_cross'
+
+
+# The tools always ask for one year of daily bars; this provider answers with the benchmarked shape instead.
+class ShapedProvider(SyntheticProvider):
+    def __init__(self, period, interval, latency=0.0):
+        super().__init__(latency=latency)
+        self.shape = (period, interval)
+
+    def history(self, ticker, period='1y', interval='1d', start=None):
+        return super().history(ticker, *self.shape)
+
+    def download(self, tickers, period='1y', interval='1d', start=None):
+        return super().download(tickers, *self.shape)
+
+
+def _summary(samples):
+    quantiles = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+    return {
+        'n': len(samples),
+        'p50_ms': quantiles[49] * 1000,
+        'p90_ms': quantiles[89] * 1000,
+        'p99_ms': quantiles[98] * 1000,
+        'mean_ms': statistics.fmean(samples) * 1000,
+    }
+
+
+def _clear_caches(history=True):
+    if history:
+        market_data.history_cache.clear()
+    chart_cache.clear()
+    response_cache.plans.clear()
+    response_cache.answers.clear()
+
+
+def _time(fn, repeat, cold):
+    fn()  # warm-up, also fills the history cache
+    samples = []
+    for _ in range(repeat):
+        _clear_caches(history=cold)
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+# Arguments for a tool call, built from its schema so new tools are picked up automatically.
+def _arguments(schema, tickers):
+    properties = schema['parameters']['properties']
+    arguments = {}
+    if 'ticker' in properties:
+        arguments['ticker'] = tickers[0]
+    if 'tickers' in properties:
+        arguments['tickers'] = tickers
+    if 'universe' in properties:
+        arguments['universe'] = ', '.join(tickers)
+    if 'conditions' in properties:
+        arguments['conditions'] = CONDITIONS
+    if 'strategy' in properties:
+        arguments['strategy'] = STRATEGY
+    if 'window' in properties:
+        arguments['window'] = WINDOW
+    return arguments
+
+
+def bench_tools(shapes, counts, repeat, cold):
+    assert max(counts) <= len(TICKERS), f'at most {len(TICKERS)} tickers can be benchmarked'
+    results = []
+    for shape in shapes:
+        market_data.set_provider(ShapedProvider(*SHAPES[shape]))
+        bars = len(market_data.get_history(TICKERS[0]))
+        for schema in functions:
+            batch = 'tickers' in schema['parameters']['properties'] or 'universe' in schema['parameters']['properties']
+            for count in (counts if batch else [1]):
+                arguments = _arguments(schema, TICKERS[:count])
+                function = available_function[schema['name']]
+                samples = _time(lambda: function(**arguments), repeat, cold)
+                results.append({'case': 'tool', 'tool': schema['name'], 'shape': shape, 'bars': bars,
+                                'tickers': count, **_summary(samples)})
+                _report(results[-1])
+    return results
+
+
+# A whole run_turn: routing, the plan and answer caches (cleared before every turn), tool dispatch and
+# the stub completions. With --llm-latency 0 this is the assistant's own overhead per turn.
+def bench_turns(repeat, llm_latency):
+    market_data.set_provider(SyntheticProvider())
+    llm = StubLLM(llm_latency)
+    results = []
+    for question in QUESTIONS:
+        prompt = question.format(ticker=TICKERS[0])
+        samples = _time(lambda: run_turn([], prompt, RecordingUI(), llm=llm), repeat, cold=False)
+        results.append({'case': 'turn', 'question': question, 'llm_latency': llm_latency, **_summary(samples)})
+        _report(results[-1])
+    return results
+
+
+def _label(result):
+    if result['case'] == 'tool':
+        return f"{result['tool']} {result['shape']} x{result['tickers']}"
+    return f"turn '{result['question']}'"
+
+
+def _report(result, baseline=None):
+    line = f"{_label(result):<50} {result['p50_ms']:>9.2f} {result['p90_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['mean_ms']:>9.2f}"
+    if baseline is not None:
+        line += f" {baseline['p50_ms'] / result['p50_ms']:>8.2f}x"
+    print(line)
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tool and chat turn benchmark on synthetic data and a stub LLM.')
+    parser.add_argument('--shapes', nargs='+', choices=list(SHAPES), default=list(SHAPES))
+    parser.add_argument('--tickers', type=int, nargs='+', default=TICKER_COUNTS, help='ticker counts for the batch tools')
+    parser.add_argument('--repeat', type=int, default=20, help='timed calls per case')
+    parser.add_argument('--cold', action='store_true', help='clear the history cache before every tool call')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='seconds per stub completion in the turn benchmark')
+    parser.add_argument('--skip-turns', action='store_true')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='earlier --json output to compare p50 against')
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<50} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+    results = bench_tools(args.shapes, args.tickers, args.repeat, args.cold)
+    if not args.skip_turns:
+        results += bench_turns(args.repeat, args.llm_latency)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            previous = {_label(result): result for result in json.load(file)['results']}
+        print(f"\n{'compared with ' + args.baseline:<50} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'speedup':>9}")
+        for result in results:
+            if _label(result) in previous:
+                _report(result, previous[_label(result)])
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({
+                'meta': {
+                    'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    'commit': _commit(),
+                    'python': platform.python_version(),
+                    'numpy': np.__version__,
+                    'pandas': pd.__version__,
+                    'machine': platform.machine(),
+                    'args': vars(args),
+                },
+                'results': results,
+            }, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
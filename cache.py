@@ -0,0 +1,90 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def default_sizeof(value):
+    # DataFrames know their own footprint, everything else falls back to the shallow size.
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage(deep=True).sum())
+    return sys.getsizeof(value)
+
+
+# A process-wide, thread-safe LRU cache with a per-entry TTL and a memory budget.
+# Streamlit re-executes main.py on every interaction but keeps imported modules alive,
+# so instances created at module level here are shared by every rerun and every session.
+class TTLCache:
+    def __init__(self, ttl=300, max_bytes=256 * 1024 * 1024, sizeof=default_sizeof):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (expires_at, nbytes, value)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, nbytes, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._nbytes -= nbytes
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    # Lookup that leaves the hit/miss counters and the LRU order alone.
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[2]
+
+    def put(self, key, value, ttl=None):
+        nbytes = self.sizeof(value)
+        if nbytes > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            self._entries[key] = (expires_at, nbytes, value)
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                _, (_, evicted_bytes, _) = self._entries.popitem(last=False)
+                self._nbytes -= evicted_bytes
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._nbytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._nbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
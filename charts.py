@@ -0,0 +1,77 @@
+import os
+from io import BytesIO
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from cache import TTLCache
+from tracing import span
+
+
+# Beyond this many points a 10 inch wide chart cannot show more detail, longer series are downsampled.
+CHART_MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', 1000))
+# Charts expire with the history they are drawn from (HISTORY_CACHE_TTL in market_data).
+CHART_TTL = int(os.environ.get('CHART_CACHE_TTL', os.environ.get('HISTORY_CACHE_TTL', 300)))
+CHART_MAX_BYTES = int(os.environ.get('CHART_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+chart_cache = TTLCache(ttl=CHART_TTL, max_bytes=CHART_MAX_BYTES, sizeof=len)
+
+
+# Largest-Triangle-Three-Buckets downsampling: keeps the first and last point and, from every bucket
+# in between, the point forming the largest triangle with the previously kept point and the average
+# of the next bucket. Peaks and troughs survive, unlike with plain striding. Returns the kept indices.
+def lttb(values, threshold):
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    positions = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    kept = np.empty(threshold, dtype=int)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = positions[end:next_end].mean()
+        next_y = values[end:next_end].mean()
+        area = np.abs(
+            (positions[previous] - next_x) * (values[start:end] - values[previous])
+            - (positions[previous] - positions[start:end]) * (next_y - values[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return kept
+
+
+# Renders the close price chart of a ticker to PNG bytes with the object-oriented Figure API, so no
+# pyplot global state or file on disk is involved and concurrent sessions cannot clash. Images are
+# cached by ticker, first and last bar, last close and size: a repeat request is a dictionary lookup,
+# and a new bar or a revised price on the current one produces a new image.
+def render_price_chart(ticker, data, title=None, size=(10, 5), dpi=100):
+    key = (ticker, data.index[0], data.index[-1], float(data['Close'].iloc[-1]), size, dpi, title)
+    with span('chart.render', bars=len(data)) as current:
+        image = chart_cache.get(key)
+        current.set(cache_hit=image is not None)
+        if image is None:
+            image = _render(ticker, data, title, size, dpi)
+            chart_cache.put(key, image)
+        return image
+
+
+def _render(ticker, data, title, size, dpi):
+    close = data['Close'].to_numpy()
+    kept = lttb(close, CHART_MAX_POINTS)
+
+    figure = Figure(figsize=size, dpi=dpi)
+    axes = figure.subplots()
+    axes.plot(data.index[kept], close[kept])
+    axes.set_title(title or f'{ticker} Stock Price Over Last Year')
+    axes.set_xlabel('Date')
+    axes.set_ylabel('Stock Price ($)')
+    axes.grid(True)
+
+    buffer = BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
@@ -0,0 +1,89 @@
+import json
+import os
+
+
+# Rough budget for the history sent with each completion, in tokens.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 1500))
+# The most recent turns are always sent verbatim, the current one included.
+RECENT_TURNS = 2
+# Older questions, answers and tool results are cut to this many characters in the summary.
+FACT_CHARS = 200
+
+
+# About four characters per token for English text and JSON, plus a few tokens of per-message overhead.
+def estimate_tokens(message):
+    text = message.get('content') or ''
+    for call in message.get('tool_calls') or []:
+        text += call['function']['name'] + call['function']['arguments']
+    return len(text) // 4 + 4
+
+
+def _shorten(text, limit=FACT_CHARS):
+    text = ' '.join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+
+# Splits the history into turns, each starting with a user message.
+def split_turns(messages):
+    turns = []
+    for message in messages:
+        if message['role'] == 'user' or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+# Collapses one finished turn into short lines: the question, one structured fact per tool result
+# (function, arguments and result) and the answer. Raw tool payloads are never resent.
+def summarize_turn(turn):
+    calls = {}
+    lines = []
+    for message in turn:
+        if message['role'] == 'user':
+            lines.append(f"User asked: {_shorten(message['content'])}")
+        elif message['role'] == 'assistant' and message.get('tool_calls'):
+            for call in message['tool_calls']:
+                calls[call['id']] = call['function']
+        elif message['role'] in ('tool', 'function'):
+            function = calls.get(message.get('tool_call_id'), {'name': message.get('name'), 'arguments': '{}'})
+            try:
+                arguments = json.loads(function['arguments'] or '{}')
+            except ValueError:
+                arguments = {}
+            arguments = ', '.join(f'{name}={value}' for name, value in arguments.items())
+            lines.append(f"{function['name']}({arguments}) = {_shorten(message['content'])}")
+        elif message['role'] == 'assistant' and message.get('content'):
+            lines.append(f"Assistant answered: {_shorten(message['content'])}")
+    return lines
+
+
+# Returns the messages to send for the next completion, keeping the payload roughly constant over a
+# long session. The last RECENT_TURNS turns go out unchanged, older turns are folded into a single
+# system message of compact facts, and the oldest facts are dropped once the token budget is spent.
+# The full history in st.session_state is left untouched.
+def compact_messages(messages, budget=CONTEXT_TOKEN_BUDGET, recent_turns=RECENT_TURNS):
+    turns = split_turns(messages)
+    recent = [message for turn in turns[-recent_turns:] for message in turn]
+    remaining = budget - sum(estimate_tokens(message) for message in recent)
+
+    # Over budget with the recent turns alone: keep only the current turn.
+    if remaining < 0 and len(turns) > 1:
+        recent = turns[-1]
+        remaining = budget - sum(estimate_tokens(message) for message in recent)
+        older = turns[:-1]
+    else:
+        older = turns[:-recent_turns]
+
+    lines = []
+    for turn in reversed(older):
+        turn_lines = summarize_turn(turn)
+        cost = sum(len(line) // 4 + 1 for line in turn_lines)
+        if cost > remaining:
+            break
+        lines[:0] = turn_lines
+        remaining -= cost
+
+    if not lines:
+        return list(recent)
+    summary = {'role': 'system', 'content': 'Earlier in this conversation:\n' + '\n'.join(lines)}
+    return [summary] + list(recent)
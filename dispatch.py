@@ -0,0 +1,83 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from tracing import span
+
+
+TOOL_WORKERS = int(os.environ.get('TOOL_WORKERS', 8))
+TOOL_TIMEOUT = float(os.environ.get('TOOL_TIMEOUT', 30))
+
+# One bounded pool for the whole process, shared by every session and rerun.
+_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix='tool')
+
+ToolResult = namedtuple('ToolResult', ['id', 'name', 'content', 'error'])
+
+
+# Keeps only the arguments declared in the function schema, so a hallucinated extra
+# argument from the model cannot break the call.
+def tool_arguments(schema, raw_arguments):
+    arguments = json.loads(raw_arguments or '{}')
+    properties = schema['parameters']['properties']
+    return {name: value for name, value in arguments.items() if name in properties}
+
+
+# Set by the worker when a call starts running, with the time it started.
+class _Started(threading.Event):
+    at = None
+
+    def set(self):
+        self.at = time.monotonic()
+        super().set()
+
+
+def _run(started, function_to_call, schema, raw_arguments):
+    started.set()
+    with span('tool', tool=schema['name']):
+        with span('tool.arguments', chars=len(raw_arguments or '')):
+            arguments = tool_arguments(schema, raw_arguments)
+        return function_to_call(**arguments)
+
+
+# Runs every tool call of one model response at the same time on the shared pool and returns
+# their results in the order the model asked for them. A call that raises or does not finish
+# within `timeout` seconds of starting comes back with an error message instead of failing the
+# whole turn. The clock starts when a worker picks the call up, so time spent queued behind other
+# sessions' calls does not count; a call still queued after `timeout` seconds is cancelled.
+# Timed out calls keep running in the background, threads cannot be interrupted.
+# Each call runs in a copy of the caller's context, so its spans join the caller's trace.
+def run_tool_calls(tool_calls, available_function, functions, timeout=TOOL_TIMEOUT):
+    schemas = {function['name']: function for function in functions}
+    calls = []
+    for tool_call in tool_calls:
+        name = tool_call['function']['name']
+        if name not in available_function:
+            calls.append((None, None))
+            continue
+        started = _Started()
+        calls.append((started, _executor.submit(contextvars.copy_context().run, _run, started, available_function[name],
+                                                schemas[name], tool_call['function']['arguments'])))
+
+    queued_until = time.monotonic() + timeout
+    results = []
+    for tool_call, (started, future) in zip(tool_calls, calls):
+        name = tool_call['function']['name']
+        content, error = None, None
+        if future is None:
+            error = f'Unknown function: {name}'
+        elif not started.wait(max(0, queued_until - time.monotonic())) and future.cancel():
+            error = f'{name} did not start within {timeout:g} seconds, all tool workers are busy'
+        else:
+            started.wait()
+            try:
+                content = future.result(timeout=max(0, started.at + timeout - time.monotonic()))
+            except TimeoutError:
+                error = f'{name} timed out after {timeout:g} seconds'
+            except Exception as e:
+                error = str(e)
+        results.append(ToolResult(tool_call['id'], name, content, error))
+    return results
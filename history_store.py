@@ -0,0 +1,76 @@
+import importlib.util
+import os
+import re
+import threading
+
+import pandas as pd
+
+
+_PERIOD = re.compile(r'(\d+)(d|wk|mo|y)')
+_OFFSETS = {
+    'd': lambda n: pd.DateOffset(days=n),
+    'wk': lambda n: pd.DateOffset(weeks=n),
+    'mo': lambda n: pd.DateOffset(months=n),
+    'y': lambda n: pd.DateOffset(years=n),
+}
+
+
+# First date covered by a yfinance period string such as '5d', '6mo' or '1y'. 'max' has no start.
+def period_start(period, tz=None):
+    now = pd.Timestamp.now(tz=tz).normalize()
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return now.replace(month=1, day=1)
+    match = _PERIOD.fullmatch(period)
+    if match is None:
+        raise ValueError(f'Unsupported period: {period}')
+    return now - _OFFSETS[match.group(2)](int(match.group(1)))
+
+
+def parquet_available():
+    return any(importlib.util.find_spec(engine) for engine in ('pyarrow', 'fastparquet'))
+
+
+# Per-ticker daily bars kept on disk as one Parquet file each, so a restart only has to
+# download the bars newer than the last stored date. Dropping Parquet files into the
+# directory by hand is enough to run from a pre-seeded dataset.
+class HistoryStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, ticker):
+        return os.path.join(self.directory, f'{ticker.upper()}.parquet')
+
+    def load(self, ticker):
+        path = self.path(ticker)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path)
+
+    def save(self, ticker, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(ticker)
+        # Write next to the target and rename so readers never see a half-written file.
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        data.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    # Appends freshly downloaded bars to the stored ones. The last stored bar is usually
+    # re-downloaded as well (it may have been a partial session), so newer rows win.
+    def append(self, ticker, stored, fresh):
+        if fresh is None or fresh.empty:
+            return stored
+        if stored is None or stored.empty:
+            merged = fresh
+        else:
+            merged = pd.concat([stored, fresh])
+            merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        self.save(ticker, merged)
+        return merged
+
+
+STORE_DIR = os.environ.get('HISTORY_STORE_DIR', 'history_store')
+
+# An empty HISTORY_STORE_DIR, or no Parquet engine installed, turns the store off.
+history_store = HistoryStore(STORE_DIR) if STORE_DIR and parquet_available() else None
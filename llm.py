@@ -0,0 +1,97 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+
+import aiohttp
+import openai
+
+
+POOL_SIZE = int(os.environ.get('OPENAI_POOL_SIZE', 32))
+
+# The key is read once per process when this module is first imported, not on every Streamlit rerun.
+# OPENAI_API_KEY in the environment (picked up by the SDK itself) takes precedence over the file.
+if openai.api_key is None and os.path.exists('API_KEY'):
+    openai.api_key = open('API_KEY', 'r').read().strip()
+
+_DONE = object()
+
+
+# Assembles the streamed deltas of one completion back into a regular assistant message.
+# Tool calls arrive in fragments keyed by their index: the id and name once, the JSON arguments piecewise.
+def _apply_delta(message, tool_calls, delta):
+    if delta.get('content'):
+        message['content'] = (message['content'] or '') + delta['content']
+    for call in delta.get('tool_calls') or []:
+        entry = tool_calls.setdefault(call['index'], {'id': None, 'type': 'function', 'function': {'name': '', 'arguments': ''}})
+        if call.get('id'):
+            entry['id'] = call['id']
+        function = call.get('function') or {}
+        entry['function']['name'] += function.get('name') or ''
+        entry['function']['arguments'] += function.get('arguments') or ''
+
+
+# Async OpenAI client shared by the whole process. It owns one event loop on a background thread
+# and one pooled aiohttp session, so every Streamlit rerun and session reuses the same keep-alive
+# connections instead of opening a new client per request. Calls are made from the (synchronous)
+# Streamlit script thread and tokens are handed back to it through a queue as they arrive.
+class LLMClient:
+    def __init__(self, pool_size=POOL_SIZE):
+        self.pool_size = pool_size
+        self._session = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='llm-loop', daemon=True)
+        self._thread.start()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def _stream(self, tokens, kwargs):
+        started = time.perf_counter()
+        first_token = None
+        chunks = 0
+        message = {'role': 'assistant', 'content': None}
+        tool_calls = {}
+        try:
+            # aiosession is a context variable, every task has to point the SDK at the shared session itself.
+            openai.aiosession.set(self._get_session())
+            async for chunk in await openai.ChatCompletion.acreate(stream=True, **kwargs):
+                if not chunk['choices']:
+                    continue
+                delta = chunk['choices'][0].get('delta') or {}
+                if delta.get('content') or delta.get('tool_calls'):
+                    chunks += 1
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                _apply_delta(message, tool_calls, delta)
+                if delta.get('content'):
+                    tokens.put(delta['content'])
+        finally:
+            tokens.put(_DONE)
+
+        if tool_calls:
+            message['tool_calls'] = [tool_calls[index] for index in sorted(tool_calls)]
+        stats = {'ttft': first_token, 'total': time.perf_counter() - started, 'chunks': chunks}
+        return message, stats
+
+    # Streams one chat completion. `on_token` is called on the calling thread with every content
+    # token as soon as it arrives. Returns the assembled message and timing stats, where 'ttft' is
+    # the time to the first token in seconds and 'chunks' the number of streamed chunks (about one
+    # token each, streamed responses carry no usage numbers).
+    def stream_chat(self, messages, on_token=None, **kwargs):
+        tokens = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._stream(tokens, dict(kwargs, messages=messages)), self._loop)
+        while True:
+            token = tokens.get()
+            if token is _DONE:
+                break
+            if on_token is not None:
+                on_token(token)
+        return future.result()
+
+
+client = LLMClient()
@@ -0,0 +1,161 @@
+# Load test for the serving path: drives N simulated chat sessions at once through assistant.run_turn
+# against a stub LLM and synthetic market data, so it needs neither an API key nor network access.
+#
+#   python loadtest.py --sessions 1 4 16 64 --turns 20
+#
+# For every concurrency level it reports throughput and turn latency percentiles. The concurrency
+# ceiling is where throughput stops growing while latency keeps climbing. Every session also plots
+# its own ticker and checks that the chart it got back is its own, so cross-session corruption of
+# charts shows up as failures.
+import argparse
+import json
+import os
+import statistics
+import string
+import sys
+import threading
+import time
+
+os.environ['HISTORY_STORE_DIR'] = ''  # keep the load test off the on-disk store
+
+import market_data
+from assistant import run_turn
+import charts
+from charts import chart_cache
+from providers import SyntheticProvider
+from response_cache import response_cache
+from router import extract_tickers
+
+
+# Made-up symbols: upper-case letters only, like real tickers, so the router and stub LLM recognise them.
+TICKERS = [f'X{first}{second}' for first in string.ascii_uppercase for second in string.ascii_uppercase][:200]
+QUESTIONS = [
+    'price of {ticker}',
+    'RSI for {ticker}',
+    '20-day SMA of {ticker}',
+    'give me a technical overview of {ticker}',
+    'plot {ticker}',
+]
+
+
+# Answers like the real model would, after `latency` seconds: tool calls for the tickers in the question,
+# then a short streamed summary of the tool results.
+class StubLLM:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def stream_chat(self, messages, on_token=None, **kwargs):
+        time.sleep(self.latency)
+        last = messages[-1]
+        message = {'role': 'assistant', 'content': None}
+        if kwargs.get('tools') and last['role'] == 'user':
+            name = 'plot_stock_price' if 'plot' in last['content'] else 'get_indicator_summary'
+            message['tool_calls'] = [
+                {'id': f'call_{index}', 'type': 'function', 'function': {'name': name, 'arguments': json.dumps({'ticker': ticker})}}
+                for index, ticker in enumerate(extract_tickers(last['content']))
+            ]
+        else:
+            message['content'] = 'Stub answer: ' + ' '.join(m['content'] for m in messages if m['role'] == 'tool')
+            if on_token is not None:
+                for word in message['content'].split(' '):
+                    on_token(word + ' ')
+        chunks = len((message['content'] or '').split(' ')) + len(message.get('tool_calls') or [])
+        return message, {'ttft': self.latency, 'total': self.latency, 'chunks': chunks}
+
+
+# Collects what a session would have shown instead of drawing it.
+class RecordingUI:
+    def __init__(self):
+        self.images = []
+        self.errors = []
+
+    def stream(self):
+        return lambda token: None
+
+    def text(self, text):
+        pass
+
+    def image(self, image):
+        self.images.append(image)
+
+    def error(self, message):
+        self.errors.append(message)
+
+
+def _session(number, turns, llm, latencies, failures):
+    ticker = TICKERS[number % len(TICKERS)]
+    messages = []
+    for turn in range(turns):
+        ui = RecordingUI()
+        question = QUESTIONS[turn % len(QUESTIONS)].format(ticker=ticker)
+        started = time.perf_counter()
+        try:
+            run_turn(messages, question, ui, llm=llm)
+        except Exception as e:
+            failures.append(f'{ticker}: {e}')
+            continue
+        latencies.append(time.perf_counter() - started)
+        failures.extend(f'{ticker}: {error}' for error in ui.errors)
+        # Compared with a fresh render, bypassing the chart cache the tool itself went through.
+        for image in ui.images:
+            if image != charts._render(ticker, market_data.get_history(ticker), None, (10, 5), 100):
+                failures.append(f'{ticker}: received a chart that is not its own')
+
+
+def run_level(sessions, turns, llm):
+    latencies, failures = [], []
+    threads = [threading.Thread(target=_session, args=(number, turns, llm, latencies, failures)) for number in range(sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'sessions': sessions,
+        'turns': len(latencies),
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': quantiles[49] * 1000,
+        'p95_ms': quantiles[94] * 1000,
+        'p99_ms': quantiles[98] * 1000,
+        'failures': len(failures),
+        'failure_examples': failures[:5],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent session load test with stub LLM and data backends.')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--turns', type=int, default=20, help='turns per session')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='seconds per stub completion')
+    parser.add_argument('--data-latency', type=float, default=0.1, help='seconds per synthetic download')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    market_data.set_provider(SyntheticProvider(latency=args.data_latency))
+    llm = StubLLM(args.llm_latency)
+
+    results = []
+    print(f"{'sessions':>8} {'turns':>6} {'turns/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failures':>8}")
+    for sessions in args.sessions:
+        # Every level starts cold so the levels are comparable.
+        market_data.history_cache.clear()
+        chart_cache.clear()
+        response_cache.plans.clear()
+        response_cache.answers.clear()
+        result = run_level(sessions, args.turns, llm)
+        results.append(result)
+        print(f"{result['sessions']:>8} {result['turns']:>6} {result['throughput']:>8.1f} {result['p50_ms']:>8.1f} "
+              f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['failures']:>8}")
+        for example in result['failure_examples']:
+            print(f'         {example}')
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+    return 1 if any(result['failures'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,241 +1,100 @@
-import json
-import openai
-import pandas as pd
-import matplotlib.pyplot as plt
+import os
+
 import streamlit as st
-import yfinance as yf
-
-openai.api_key = open('API_KEY', 'r').read()
-
-
-
-def get_stock_price(ticker):
-    return str(yf.Ticker(ticker).history(period='1y').iloc[-1].Close)
-
-
-# A simple moving average (SMA) is an arithmetic moving average calculated by adding recent prices and then dividing that figure by the number of time periods in the calculation average.
-def calculate_SMA(ticker, window):
-    data = yf.Ticker(ticker).history(period='1y').Close
-    return str(data.rolling(window=window).mean().iloc[-1])
-
-
-# The exponential moving average (EMA) is a technical chart indicator that tracks the price of an investment (like a stock or commodity) over time. The EMA is a type of weighted moving average (WMA) that gives more weighting or importance to recent price data.
-def calculate_EMA(ticker, window):
-    data = yf.Ticker(ticker).history(period='1y').Close
-    return str(data.ewm(span=window, adjust=False).mean().iloc[-1])
-
-
-# The Relative Strength Index (RSI), developed by J. Welles Wilder, is a momentum oscillator that measures the speed and change of price movements. The RSI oscillates between zero and 100. Traditionally the RSI is considered overbought when above 70 and oversold when below 30.
-def calculate_RSI(ticker):
-    data = yf.Ticker(ticker).history(period='1y').Close
-    delta = data.diff()
-    up = delta.clip(lower = 0)
-    down = -1 * delta.clip(upper = 0)
-    ema_up = up.ewm(com = 14 - 1, adjust=False).mean()
-    ema_down = down.ewm(com = 14 - 1, adjust=False).mean()
-    rs = ema_up / ema_down
-    return str(100 - (100 / (1+rs)).iloc[-1])
-
-
-# Moving average convergence/divergence (MACD, or MAC-D) is a trend-following momentum indicator that shows the relationship between two exponential moving averages (EMAs) of a security's price. The MACD line is calculated by subtracting the 26-period EMA from the 12-period EMA.
-def calculate_MACD(ticker):
-    data = yf.Ticker(ticker).history(period='1y').Close
-    short_EMA = data.ewm(span=12, adjust=False).mean()
-    long_EMA = data.ewm(span=26, adjust=False).mean()
-
-    MACD = short_EMA - long_EMA
-    signal = MACD.ewm(span=9, adjust=False).mean()
-    MACD_histogram = MACD - signal
-
-    return f'{MACD[-1]}, {signal[-1]}, {MACD_histogram[-1]}'
-
-
-def plot_stock_price(ticker):
-    data = yf.Ticker(ticker).history(period='1y')
-    if data.empty:
-        st.error(f"No data available for {ticker}. Please check the stock symbol.")
-        return
-
-    plt.figure(figsize=(10, 5))
-    plt.plot(data.index, data['Close'])
-    plt.title(f'{ticker} Stock Price Over Last Year')
-    plt.xlabel('Date')
-    plt.ylabel('Stock Price ($)')
-    plt.grid(True)
-    plt.savefig('stock.png')
-    plt.close()
-
-
-# function with list , list with inside a Dictionary
-functions = [
-    {
-        'name': 'get_stock_price',
-        'description': 'Gets the latest stock price given the ticker symbol of a company.',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'ticker': {
-                    'type': 'string',
-                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
-                },
-            },
-            'required': ['ticker'],
-        },
-    },
-    {
-        'name': 'calculate_SMA',
-        'description': 'A simple moving average (SMA) is an arithmetic moving average calculated by adding recent prices and then dividing that figure by the number of time periods in the calculation average. Calculate SMA for a given stock ticket and a window',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'ticker': {
-                    'type': 'string',
-                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
-                },
-                'window': {
-                    'type': 'integer',
-                    'description': "The timeframe to consider when calculating the SMA."
-                },
-            },
-            'required': ['ticker', 'window'],
-        },
-    },
-    {
-        'name': 'calculate_EMA',
-        'description': 'The exponential moving average (EMA) is a technical chart indicator that tracks the price of an investment (like a stock or commodity) over time. The EMA is a type of weighted moving average (WMA) that gives more weighting or importance to recent price data. Calculate the EMA for a given stock ticker and a window.',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'ticker': {
-                    'type': 'string',
-                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
-                },
-                'window': {
-                    'type': 'integer',
-                    'description': "The timeframe to consider when calculating the SMA."
-                },
-            },
-            'required': ['ticker', 'window'],
-        },
-    },
-    {
-        'name': 'calculate_RSI',
-        'description': 'The Relative Strength Index (RSI), developed by J. Welles Wilder, is a momentum oscillator that measures the speed and change of price movements. The RSI oscillates between zero and 100. Traditionally the RSI is considered overbought when above 70 and oversold when below 30. Calculate the RSI for a given stock ticker.',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'ticker': {
-                    'type': 'string',
-                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
-                },
-            },
-            'required': ['ticker'],
-        },
-    },
-    {
-        'name': 'calculate_MACD',
-        'description': 'Moving average convergence/divergence (MACD, or MAC-D) is a trend-following momentum indicator that shows the relationship between two exponential moving averages (EMAs) of a security\'s price. The MACD line is calculated by subtracting the 26-period EMA from the 12-period EMA. Calculate the MACD for a given stock ticker.',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'ticker': {
-                    'type': 'string',
-                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
-                },
-            },
-            'required': ['ticker'],
-        },
-    },
-    {
-        'name': 'plot_stock_price',
-        'description': 'It typically shows the current price, historical highs and lows, and trading volumes. Plot the stock price for the last year given the ticker symbol of a company.',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'ticker': {
-                    'type': 'string',
-                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
-                }
-            },
-            'required': ['ticker'],
-        },
-    },
 
-]
+import market_data
+import tracing
+from assistant import run_turn
+from charts import chart_cache
+from screener import parse_watchlist, watchlist
+from response_cache import response_cache
 
 
+# Turns shown in the optional debug panel.
+DEBUG_TURNS = int(os.environ.get('DEBUG_TURNS', 5))
 
-available_function = {
-    'get_stock_price': get_stock_price,
-    'calculate_SMA': calculate_SMA,
-    'calculate_EMA': calculate_EMA,
-    'calculate_RSI': calculate_RSI,
-    'calculate_MACD': calculate_MACD,
-    'plot_stock_price': plot_stock_price,
-}
 
+# Streamlit side of an assistant turn. Every output area belongs to the session running this script,
+# charts are passed as bytes and never written to a shared file.
+class StreamlitUI:
+    # Returns a token callback that keeps rewriting a fresh placeholder with the text streamed so far.
+    def stream(self):
+        placeholder = st.empty()
+        streamed = []
 
-if 'messages' not in st.session_state:
-    st.session_state['messages'] = []
+        def show_token(token):
+            streamed.append(token)
+            placeholder.text(''.join(streamed))
 
-st.title("Financial Stock AI Assistant")
+        return show_token
 
-user_input = st.text_input("Your input: ")
+    def text(self, text):
+        st.text(text)
 
-if user_input:
-    try:
-        st.session_state['messages'].append({'role':'user', 'content': f'{user_input}'})
-
-        response = openai.ChatCompletion.create(
-            model = 'gpt-3.5-turbo-0613',
-            messages=st.session_state['messages'],
-            functions = functions,
-            function_call = 'auto',
-        )
-
-        response_message = response['choices'][0]['message']
-
-        if response_message.get('function_call'):
-            function_name = response_message['function_call']['name']
-            function_args = json.loads(response_message['function_call']['arguments'])
-            if function_name in ['get_stock_price', 'calculate_RSI', 'calculate_MACD', 'plot_stock_price']:
-                args_dict = {'ticker': function_args.get('ticker')}
-            elif function_name in ['calculate_EMA', 'calculate_SMA']:
-                args_dict = {'ticker': function_args.get('ticker'), 'window': function_args.get('window')}
-
-            function_to_call = available_function[function_name]
-            function_response = function_to_call(**args_dict)
-
-            if function_name == 'plot_stock_price':
-                st.image('stock.png')
-            else:
-                st.session_state['messages'].append(response_message)
-                st.session_state['messages'].append(
-                    {
-                        'role': 'function',
-                        'name': function_name,
-                        'content': function_response
-                    }
-                )
-                second_response = openai.ChatCompletion.create(
-                    model = 'gpt-3.5-turbo-0613',
-                    messages = st.session_state['messages']
-                )
-                st.text(second_response['choices'][0]['message']['content'])
-                st.session_state['messages'].append({'role': 'assistant', 'content': second_response['choices'][0]['message']['content']})
-        else:
-            st.text(response_message['content'])
-            st.session_state['messages'].append({'role': 'assistant', 'content': response_message['content']})
+    def image(self, image):
+        st.image(image)
 
+    def error(self, message):
+        st.error(message)
 
-    except Exception as e:
-        st.error(f"An error occurred: {e}")
+
+# Stage by stage timing of this session's last turns, with the process-wide cache and coalescing counters.
+def show_debug_panel(traces):
+    with st.sidebar.expander('Debug: last turns', expanded=True):
+        for turn in reversed(traces[-DEBUG_TURNS:]):
+            st.caption(f"{turn.root.attributes.get('prompt', '')} - {turn.root.duration_ms:.0f} ms")
+            st.dataframe([
+                {
+                    'stage': '  ' * depth + span.name,
+                    'ms': round(span.duration_ms, 2),
+                    'details': ', '.join(f'{key}={value}' for key, value in span.attributes.items() if key != 'prompt'),
+                    'error': span.error or '',
+                }
+                for depth, span in turn.breakdown()
+            ], hide_index=True)
+        stats = {
+            'history cache': market_data.history_cache.stats(),
+            'history single-flight': market_data.history_flight.stats(),
+            'chart cache': chart_cache.stats(),
+            **{f'{name} cache': value for name, value in response_cache.stats().items()},
+        }
+        st.dataframe([{'': name, **value} for name, value in stats.items()], hide_index=True)
 
 
+if 'messages' not in st.session_state:
+    st.session_state['messages'] = []
+if 'traces' not in st.session_state:
+    st.session_state['traces'] = []
 
+st.title("Financial Stock AI Assistant")
 
+cache_stats = response_cache.stats()
+st.sidebar.caption(
+    f"Response cache hit rate: questions {cache_stats['plans']['hit_rate']:.0%}, "
+    f"answers {cache_stats['answers']['hit_rate']:.0%}"
+)
 
+uploaded = st.sidebar.file_uploader('Watchlist (tickers as text or CSV)', type=['txt', 'csv'])
+if uploaded is not None:
+    # Read by the screen_stocks tool when asked to scan "my watchlist".
+    watchlist.set(parse_watchlist(uploaded.getvalue().decode('utf-8', errors='ignore')))
+    st.sidebar.caption(f'{len(watchlist.get())} tickers in the watchlist')
 
+user_input = st.text_input("Your input: ")
+
+if user_input:
+    try:
+        with tracing.trace('turn', prompt=user_input) as turn:
+            # Kept before running so a failed turn shows up in the debug panel too.
+            st.session_state['traces'] = (st.session_state['traces'] + [turn.trace])[-DEBUG_TURNS:]
+            _, ttft = run_turn(st.session_state['messages'], user_input, StreamlitUI())
+
+        if ttft is not None:
+            st.caption(f"First token after {ttft:.2f} s")
 
 
+    except Exception as e:
+        st.error(f"An error occurred: {e}")
 
+if st.sidebar.checkbox('Show debug panel') and st.session_state['traces']:
+    show_debug_panel(st.session_state['traces'])
@@ -0,0 +1,315 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache import TTLCache
+from history_store import history_store, period_start
+from providers import get_provider
+from singleflight import SingleFlight
+from tracing import span
+
+
+# Daily bars only change once per session, so a few minutes of staleness is fine for the assistant.
+HISTORY_TTL = int(os.environ.get('HISTORY_CACHE_TTL', 300))
+HISTORY_MAX_BYTES = int(os.environ.get('HISTORY_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Stored bars may start a few days after the period start because of weekends and holidays.
+STORE_SLACK = pd.Timedelta(days=7)
+
+# Intraday intervals in minutes. Bars are aligned on the 9:30 open like the ones yfinance delivers.
+INTRADAY_MINUTES = {'1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '90m': 90}
+# Intraday bases by fineness, with how many days back yfinance serves them.
+INTRADAY_BASES = (('1m', 7), ('5m', 60), ('60m', 730))
+DAILY_INTERVALS = ('1d', '1wk', '1mo', '3mo')
+PERIODS = ('1d', '5d', '1mo', '3mo', '6mo', 'ytd', '1y', '2y', '5y', '10y', 'max')
+# Intraday bars are not dividend adjusted, daily bars are derived from them only over short periods.
+DAILY_FROM_INTRADAY_DAYS = 60
+
+# Resampling rules and how each column aggregates.
+RESAMPLE_RULES = {'1d': '1D', '1wk': 'W-MON', '1mo': 'MS', '3mo': 'QS'}
+AGGREGATIONS = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum',
+                'Dividends': 'sum', 'Stock Splits': 'sum'}
+
+history_cache = TTLCache(ttl=HISTORY_TTL, max_bytes=HISTORY_MAX_BYTES)
+history_flight = SingleFlight()
+
+# Where bars come from: yfinance, a local replay directory or synthetic data (see providers.py).
+provider = get_provider()
+
+
+# Swaps the market data backend, e.g. to synthetic data for benchmarks. Cached bars from the old one are dropped.
+def set_provider(new_provider):
+    global provider
+    provider = new_provider
+    history_cache.clear()
+
+
+# Only daily bars from a remote backend are worth keeping in the on-disk store.
+def _use_store(interval):
+    return history_store is not None and provider.remote and interval == '1d'
+
+
+# A dividend or split inside the new bars rewrites the adjusted prices of every older bar.
+def _has_corporate_action(data):
+    return any(column in data and (data[column] != 0).any() for column in ('Dividends', 'Stock Splits'))
+
+
+# Date to download from when the stored bars already cover the period, None when a full download is needed.
+def _top_up_start(stored, period):
+    if stored is None or stored.empty:
+        return None
+    start = period_start(period, tz=stored.index.tz)
+    if start is None or stored.index[0] > start + STORE_SLACK:
+        return None
+    return stored.index[-1].strftime('%Y-%m-%d')
+
+
+# Folds freshly downloaded bars into the store and returns the requested period.
+# An empty download (network down, unknown symbol) serves whatever is already on disk.
+def _merge_stored(ticker, period, stored, since, fresh):
+    if fresh is None or fresh.empty:
+        data = stored if stored is not None else fresh
+    elif since is None:
+        data = history_store.append(ticker, None, fresh)
+    elif _has_corporate_action(fresh.loc[fresh.index > stored.index[-1]]):
+        data = history_store.append(ticker, None, provider.history(ticker, period=period, interval='1d'))
+    else:
+        data = history_store.append(ticker, stored, fresh)
+
+    if data is None or data.empty:
+        return pd.DataFrame() if data is None else data
+    start = period_start(period, tz=data.index.tz)
+    return data if start is None else data.loc[data.index >= start]
+
+
+# Daily history read from the on-disk store first, only the bars after the last stored date are downloaded.
+def _stored_daily_history(ticker, period):
+    stored = history_store.load(ticker)
+    since = _top_up_start(stored, period)
+    try:
+        fresh = provider.history(ticker, period=period, interval='1d', start=since)
+    except Exception:
+        if stored is None or stored.empty:
+            raise
+        fresh = None
+    return _merge_stored(ticker, period, stored, since, fresh)
+
+
+# A failed bulk download serves the stored bars, as long as every ticker in it has some.
+def _download_or_stored(tickers, stored, **window):
+    try:
+        return provider.download(tickers, interval='1d', **window)
+    except Exception:
+        if any(stored[ticker] is None or stored[ticker].empty for ticker in tickers):
+            raise
+        return {}
+
+
+# Same as _stored_daily_history for many tickers: one bulk download for the tickers that need
+# a full period and one for the tickers that only need topping up.
+def _stored_daily_histories(tickers, period):
+    stored = {ticker: history_store.load(ticker) for ticker in tickers}
+    since = {ticker: _top_up_start(stored[ticker], period) for ticker in tickers}
+
+    fresh = {}
+    full = [ticker for ticker in tickers if since[ticker] is None]
+    top_up = [ticker for ticker in tickers if since[ticker] is not None]
+    if full:
+        fresh.update(_download_or_stored(full, stored, period=period))
+    if top_up:
+        fresh.update(_download_or_stored(top_up, stored, start=min(since[ticker] for ticker in top_up)))
+
+    return {
+        ticker: _merge_stored(ticker, period, stored[ticker], since[ticker], fresh.get(ticker))
+        for ticker in tickers
+    }
+
+
+def normalize_interval(interval):
+    return '60m' if interval == '1h' else interval
+
+
+# The period the tools use when a question names a bar size but no time span.
+def default_period(interval):
+    minutes = INTRADAY_MINUTES.get(normalize_interval(interval))
+    if minutes is not None:
+        return '5d' if minutes < 60 else '1mo'
+    return {'1wk': '5y', '1mo': '10y', '3mo': '10y'}.get(interval, '1y')
+
+
+def _period_days(period):
+    start = period_start(period)
+    return None if start is None else (pd.Timestamp.now().normalize() - start).days
+
+
+def _minutes(interval):
+    return INTRADAY_MINUTES.get(interval)
+
+
+# Bar size downloaded to serve `interval` over `period`: daily bars for daily and coarser intervals,
+# otherwise the finest intraday bars available that far back and evenly dividing the interval.
+# One download of that base then serves every coarser intraday interval by resampling.
+def base_interval(period, interval):
+    if interval in DAILY_INTERVALS:
+        return '1d'
+    if _minutes(interval) is None:
+        return interval
+    days = _period_days(period)
+    for base, limit in INTRADAY_BASES:
+        if days is not None and days <= limit and _minutes(interval) % _minutes(base) == 0:
+            return base
+    return interval
+
+
+# Intervals whose bars can be resampled into `interval`, finest first.
+def _finer_intervals(interval, period):
+    if interval in DAILY_INTERVALS:
+        days = _period_days(period)
+        intraday = [base for base, _ in INTRADAY_BASES] if interval == '1d' and days is not None and days <= DAILY_FROM_INTRADAY_DAYS else []
+        return intraday + ['1d']
+    return [base for base in INTRADAY_MINUTES if _minutes(interval) % _minutes(base) == 0]
+
+
+# The last `period` of bars. The result is a view on `data`, not a copy. Day periods count trading
+# days, as yfinance does.
+def _tail(data, period):
+    if data.empty:
+        return data
+    if period.endswith('d') and period != 'ytd':
+        days = data.index.normalize().unique()
+        start = days[-int(period[:-1])] if len(days) >= int(period[:-1]) else days[0]
+    else:
+        start = period_start(period, tz=data.index.tz)
+        if start is None:
+            return data
+    return data.iloc[data.index.searchsorted(start):]
+
+
+# Aggregates OHLCV bars into coarser ones. Empty bins (nights, weekends, holidays) are dropped.
+def resample_bars(data, interval):
+    if data.empty:
+        return data
+    aggregations = {column: how for column, how in AGGREGATIONS.items() if column in data}
+    if interval in RESAMPLE_RULES:
+        resampler = data.resample(RESAMPLE_RULES[interval], label='left', closed='left')
+    else:
+        resampler = data.resample(f'{_minutes(interval)}min', origin='start_day', offset='30min', label='left', closed='left')
+    return resampler.agg(aggregations).dropna(subset=['Close'])
+
+
+# Bars for `key` from a cached series of the same ticker covering at least the period, at the same or
+# a finer interval, or None. Same-interval results are views into the cached frame and are not cached
+# again; resampled ones are.
+def _from_cached(key):
+    ticker, period, interval = key
+    days = _period_days(period)
+    covering = [candidate for candidate in PERIODS
+                if candidate == period or _period_days(candidate) is None or days is not None and _period_days(candidate) >= days]
+    for base in reversed(_finer_intervals(interval, period)):
+        for candidate in covering:
+            data = history_cache.peek((ticker, candidate, base))
+            if data is not None:
+                return _derive(key, data if candidate == period else _tail(data, period), base)
+    return None
+
+
+def _derive(key, data, base):
+    if base == key[2]:
+        return data
+    with span('market_data.resample', source=base, interval=key[2], bars=len(data)):
+        bars = resample_bars(data, key[2])
+    if not bars.empty:
+        history_cache.put(key, bars)
+    return bars
+
+
+def _cache_histories(keys, downloaded):
+    histories = {}
+    for key in keys:
+        data = downloaded[key[0]]
+        # Do not cache empty frames, an unknown symbol should not stick around for the whole TTL.
+        if not data.empty:
+            history_cache.put(key, data)
+        histories[key] = data
+    return histories
+
+
+# Runs under the single-flight lead for `keys`, all sharing one period and interval. The cache is
+# checked again first: another thread may have finished the same fetch right after our cache miss.
+def _fetch_histories(keys):
+    histories = {key: history_cache.peek(key) for key in keys}
+    missing = [key for key, data in histories.items() if data is None]
+    if not missing:
+        return histories
+
+    _, period, interval = missing[0]
+    tickers = [ticker for ticker, _, _ in missing]
+    with span('market_data.download', tickers=len(tickers), period=period, interval=interval,
+              provider=type(provider).__name__, store=_use_store(interval)):
+        if len(tickers) == 1:
+            if _use_store(interval):
+                downloaded = {tickers[0]: _stored_daily_history(tickers[0], period)}
+            else:
+                downloaded = {tickers[0]: provider.history(tickers[0], period=period, interval=interval)}
+        elif _use_store(interval):
+            downloaded = _stored_daily_histories(tickers, period)
+        else:
+            downloaded = provider.download(tickers, period=period, interval=interval)
+    histories.update(_cache_histories(missing, downloaded))
+    return histories
+
+
+# Returns the OHLCV history of a ticker, downloading it only when it is not already cached.
+# Concurrent requests for the same history share one download through history_flight.
+# Bars are cut and resampled from a cached longer or finer series where possible; otherwise the
+# base interval (see base_interval) is downloaded once and resampled.
+# The returned DataFrame is shared between callers and must not be modified in place.
+def get_history(ticker, period='1y', interval='1d'):
+    key = (ticker.upper(), period, normalize_interval(interval))
+    with span('market_data.history', tickers=1, period=period, interval=key[2]) as current:
+        data = history_cache.get(key)
+        if data is None:
+            data = _from_cached(key)
+        current.set(cache_hit=data is not None)
+        if data is None:
+            base = base_interval(period, key[2])
+            if base == key[2]:
+                data = history_flight.do_many([key], _fetch_histories)[key]
+            else:
+                data = _derive(key, get_history(key[0], period, base), base)
+        return data
+
+
+# Batch version of get_history: every ticker missing from the cache is fetched in a single bulk download,
+# except those another request is already fetching, which are waited for instead.
+def get_histories(tickers, period='1y', interval='1d'):
+    interval = normalize_interval(interval)
+    keys = [(ticker, period, interval) for ticker in dict.fromkeys(ticker.upper() for ticker in tickers)]
+    with span('market_data.history', tickers=len(keys), period=period, interval=interval) as current:
+        histories = {key: history_cache.get(key) for key in keys}
+        for key in [key for key, data in histories.items() if data is None]:
+            histories[key] = _from_cached(key)
+        missing = [key for key, data in histories.items() if data is None]
+        current.set(cache_hits=len(keys) - len(missing))
+        base = base_interval(period, interval)
+        if missing and base == interval:
+            histories.update(history_flight.do_many(missing, _fetch_histories))
+        elif missing:
+            bases = get_histories([ticker for ticker, _, _ in missing], period, base)
+            histories.update({key: _derive(key, bases[key[0]], base) for key in missing})
+    return {ticker: histories[(ticker, period, interval)] for ticker, _, _ in keys}
+
+
+# Close prices of several tickers as one wide DataFrame (one column per ticker). Each column holds only
+# that ticker's own bars, aligned on the last bar and NaN-padded at the top, so indicators over a column
+# match the single-ticker tools even when trading calendars differ. The index is that of the longest
+# history; unknown tickers are all-NaN columns.
+def get_close_matrix(tickers, period='1y', interval='1d'):
+    histories = get_histories(tickers, period=period, interval=interval)
+    index = max((data.index for data in histories.values()), key=len, default=pd.DatetimeIndex([]))
+    values = np.full((len(index), len(histories)), np.nan)
+    for column, data in enumerate(histories.values()):
+        if not data.empty:
+            values[len(index) - len(data):, column] = data['Close'].to_numpy()
+    return pd.DataFrame(values, index=index, columns=list(histories))
@@ -0,0 +1,109 @@
+# A tiny stand-in for the OpenAI chat completions endpoint, for trying the assistant without an API key
+# and for measuring streaming latency locally:
+#
+#   python mock_openai.py --port 8001 --delay 0.05
+#   OPENAI_API_BASE=http://localhost:8001/v1 streamlit run main.py
+#
+# When tools are offered and the last user message contains upper-case tickers, it asks for
+# get_stock_price on each of them in parallel. Otherwise it streams back a short canned answer
+# word by word, waiting `--delay` seconds before every chunk.
+import argparse
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+TICKER = re.compile(r'\b[A-Z]{1,5}\b')
+
+
+def _reply(request):
+    messages = request.get('messages', [])
+    last = messages[-1] if messages else {}
+    if request.get('tools') and last.get('role') == 'user':
+        tickers = TICKER.findall(last.get('content') or '')
+        if tickers:
+            return None, [
+                {'id': f'call_{index}', 'type': 'function',
+                 'function': {'name': 'get_stock_price', 'arguments': json.dumps({'ticker': ticker})}}
+                for index, ticker in enumerate(tickers)
+            ]
+    if last.get('role') == 'tool':
+        results = [m['content'] for m in messages if m.get('role') == 'tool']
+        return f'Here is what I found: {", ".join(results)}.', None
+    return 'This is a mock answer from the local test server.', None
+
+
+def _chunk(delta, finish_reason=None):
+    return {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': 'mock',
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        content, tool_calls = _reply(request)
+        if request.get('stream'):
+            self._stream(content, tool_calls)
+        else:
+            message = {'role': 'assistant', 'content': content}
+            if tool_calls:
+                message['tool_calls'] = tool_calls
+            self._send(json.dumps({'id': 'chatcmpl-mock', 'object': 'chat.completion', 'model': 'mock',
+                                   'choices': [{'index': 0, 'message': message, 'finish_reason': 'stop'}]}).encode())
+
+    def _send(self, body, content_type='application/json'):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, content, tool_calls):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        deltas = [{'role': 'assistant'}]
+        if tool_calls:
+            for index, call in enumerate(tool_calls):
+                deltas.append({'tool_calls': [{'index': index, 'id': call['id'], 'type': 'function',
+                                               'function': {'name': call['function']['name'], 'arguments': ''}}]})
+                deltas.append({'tool_calls': [{'index': index, 'function': {'arguments': call['function']['arguments']}}]})
+        else:
+            deltas += [{'content': word} for word in re.findall(r'\S+\s*', content)]
+
+        for delta in deltas:
+            time.sleep(self.delay)
+            self._write_event(json.dumps(_chunk(delta)))
+        self._write_event(json.dumps(_chunk({}, 'tool_calls' if tool_calls else 'stop')))
+        self._write_event('[DONE]')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_event(self, data):
+        event = f'data: {data}\n\n'.encode()
+        self.wfile.write(f'{len(event):x}\r\n'.encode() + event + b'\r\n')
+        self.wfile.flush()
+
+
+def serve(port=8001, delay=0.0):
+    MockOpenAIHandler.delay = delay
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockOpenAIHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mock OpenAI chat completions server.')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=0.05, help='seconds to wait before every streamed chunk')
+    args = parser.parse_args()
+    print(f'Mock OpenAI API on http://127.0.0.1:{args.port}/v1')
+    serve(args.port, args.delay).serve_forever()
@@ -0,0 +1,168 @@
+import os
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from history_store import STORE_DIR, period_start
+
+
+# Market data backends. Every provider offers the same two calls, shaped like yfinance:
+#   history(ticker, period, interval, start=None) -> OHLCV DataFrame, empty for unknown tickers
+#   download(tickers, period, interval, start=None) -> {ticker: DataFrame}
+# `remote` tells market_data whether the bars are worth persisting in the local history store.
+# The backend is chosen with MARKET_DATA_PROVIDER (yfinance, replay or synthetic).
+
+
+class YFinanceProvider:
+    remote = True
+
+    def history(self, ticker, period='1y', interval='1d', start=None):
+        if start is not None:
+            return yf.Ticker(ticker).history(start=start, interval=interval)
+        return yf.Ticker(ticker).history(period=period, interval=interval)
+
+    # One bulk request for all tickers, split into one frame per ticker. yf.download drops the time
+    # zone by default; ignore_tz=False keeps the exchange time zone that Ticker.history returns, so
+    # bars from both calls can be compared and merged.
+    def download(self, tickers, period='1y', interval='1d', start=None):
+        window = {'start': start} if start is not None else {'period': period}
+        frame = yf.download(tickers, interval=interval, group_by='ticker', auto_adjust=True, actions=True,
+                            progress=False, threads=True, ignore_tz=False, **window)
+        if isinstance(frame.index, pd.DatetimeIndex) and frame.index.tz is None:
+            frame.index = frame.index.tz_localize('America/New_York')
+        if not isinstance(frame.columns, pd.MultiIndex):
+            return {tickers[0]: frame.dropna(how='all')}
+        present = set(frame.columns.get_level_values(0))
+        return {
+            ticker: frame[ticker].dropna(how='all') if ticker in present else pd.DataFrame()
+            for ticker in tickers
+        }
+
+
+def _slice(data, period, start):
+    if data.empty:
+        return data
+    if start is not None:
+        return data.loc[data.index >= pd.Timestamp(start, tz=data.index.tz)]
+    first = period_start(period, tz=data.index.tz)
+    if first is None:
+        return data
+    # Periods count back from the last recorded bar, as if the recording ended today.
+    first += data.index[-1].normalize() - pd.Timestamp.now(tz=data.index.tz).normalize()
+    return data.loc[data.index >= first]
+
+
+# Replays bars recorded on disk: <TICKER>.parquet or <TICKER>.csv for daily bars and
+# <TICKER>_<interval>.parquet/.csv for any other interval. The history store directory has exactly
+# this layout, so a store filled by earlier online sessions can be replayed as is.
+class ReplayProvider:
+    remote = False
+
+    def __init__(self, directory=STORE_DIR):
+        self.directory = directory
+
+    def _load(self, ticker, interval):
+        name = ticker.upper() if interval == '1d' else f'{ticker.upper()}_{interval}'
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path + '.parquet'):
+            return pd.read_parquet(path + '.parquet')
+        if os.path.exists(path + '.csv'):
+            data = pd.read_csv(path + '.csv', index_col=0)
+            try:
+                index = pd.to_datetime(data.index)
+            except ValueError:
+                # Offsets that change with daylight saving time only parse as UTC.
+                index = pd.to_datetime(data.index, utc=True)
+            # Date-only stamps are exchange local dates; reading them as UTC would move each bar to the day before.
+            data.index = index.tz_localize('America/New_York') if index.tz is None else index.tz_convert('America/New_York')
+            return data
+        return pd.DataFrame()
+
+    def history(self, ticker, period='1y', interval='1d', start=None):
+        return _slice(self._load(ticker, interval), period, start)
+
+    def download(self, tickers, period='1y', interval='1d', start=None):
+        return {ticker: self.history(ticker, period, interval, start) for ticker in tickers}
+
+
+_MINUTES = {'1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '90m': 90, '1h': 60}
+_SESSION_MINUTES = 390
+
+
+# Deterministic geometric random walks, one per ticker and interval, for offline benchmarks and tests.
+# The walk is generated backwards from the latest bar, so the same ticker always ends on the same
+# prices and a longer period only adds older bars. `latency` simulates the network round trip.
+class SyntheticProvider:
+    remote = False
+
+    def __init__(self, seed=0, latency=0.0, volatility=0.02):
+        self.seed = seed
+        self.latency = latency
+        self.volatility = volatility
+
+    def _index(self, period, interval, start):
+        now = pd.Timestamp.now(tz='America/New_York').normalize()
+        if start is not None:
+            first = pd.Timestamp(start, tz='America/New_York')
+        else:
+            first = period_start(period, tz='America/New_York')
+        if first is None:
+            first = now - (pd.DateOffset(days=30) if interval in _MINUTES else pd.DateOffset(years=10))
+        if interval == '1wk':
+            return pd.date_range(first, now, freq='W-MON')
+        if interval in ('1mo', '3mo'):
+            return pd.date_range(first, now, freq='MS' if interval == '1mo' else 'QS')
+        days = pd.bdate_range(first.tz_localize(None), now.tz_localize(None))
+        if interval not in _MINUTES:
+            return days.tz_localize('America/New_York')
+        offsets = pd.to_timedelta(9 * 60 + 30 + np.arange(0, _SESSION_MINUTES, _MINUTES[interval]), unit='min')
+        stamps = (days.to_numpy()[:, None] + offsets.to_numpy()[None, :]).ravel()
+        return pd.DatetimeIndex(stamps).tz_localize('America/New_York')
+
+    def _generate(self, ticker, period, interval, start):
+        index = self._index(period, interval, start)
+        n = len(index)
+        seeds = np.random.SeedSequence([self.seed, zlib.crc32(f'{ticker.upper()}/{interval}'.encode())])
+        walk, spreads, volumes = (np.random.default_rng(child) for child in seeds.spawn(3))
+        scale = self.volatility * np.sqrt(_MINUTES[interval] / _SESSION_MINUTES if interval in _MINUTES else 1.0)
+
+        # Draws are consumed from the latest bar backwards: close[-1] is `last`, each step back undoes one return.
+        last = 20 + walk.random() * 480
+        returns = walk.normal(0.0, scale, n)
+        close = np.exp(np.log(last) - np.concatenate(([0.0], np.cumsum(returns[:-1])))[::-1])
+        open_ = np.concatenate(([close[0]], close[:-1]))
+        spread = np.abs(spreads.normal(0.0, scale / 2, n))[::-1]
+        return pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) * (1 + spread),
+            'Low': np.minimum(open_, close) * (1 - spread),
+            'Close': close,
+            'Volume': volumes.integers(100_000, 10_000_000, n)[::-1].astype(float),
+            'Dividends': 0.0,
+            'Stock Splits': 0.0,
+        }, index=index)
+
+    def history(self, ticker, period='1y', interval='1d', start=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._generate(ticker, period, interval, start)
+
+    def download(self, tickers, period='1y', interval='1d', start=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return {ticker: self._generate(ticker, period, interval, start) for ticker in tickers}
+
+
+def get_provider(name=None):
+    name = name or os.environ.get('MARKET_DATA_PROVIDER', 'yfinance')
+    if name == 'yfinance':
+        return YFinanceProvider()
+    if name == 'replay':
+        return ReplayProvider(os.environ.get('MARKET_DATA_DIR', STORE_DIR))
+    if name == 'synthetic':
+        return SyntheticProvider(seed=int(os.environ.get('SYNTHETIC_SEED', 0)),
+                                 latency=float(os.environ.get('SYNTHETIC_LATENCY', 0)))
+    raise ValueError(f'Unknown market data provider: {name}')
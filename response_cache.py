@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import re
+import uuid
+from datetime import datetime, time as dt_time, timedelta
+from zoneinfo import ZoneInfo
+
+from cache import TTLCache
+from market_data import HISTORY_TTL
+
+
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = dt_time(9, 30)
+MARKET_CLOSE = dt_time(16, 0)
+# Outside trading hours prices do not move, but news and corrections still trickle in.
+CLOSED_TTL_CAP = int(os.environ.get('RESPONSE_CACHE_CLOSED_TTL', 6 * 3600))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+
+
+# How long a cached answer stays valid. While the US market is open prices can only change as often
+# as the history cache refreshes; once it is closed they hold until the next open.
+def market_ttl(now=None):
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    if now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE:
+        return HISTORY_TTL
+    next_open = datetime.combine(now.date(), MARKET_OPEN, tzinfo=MARKET_TZ)
+    if now.time() >= MARKET_OPEN:
+        next_open += timedelta(days=1)
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+    return max(1, min(CLOSED_TTL_CAP, int((next_open - now).total_seconds())))
+
+
+# "What's AAPL trading at?" and "what's aapl trading at" are the same question.
+def normalize_prompt(prompt):
+    return ' '.join(re.sub(r'[^\w\s.$-]', ' ', prompt.lower()).split()).strip(' .')
+
+
+def _mentioned_tickers(tool_calls):
+    tickers = []
+    for call in tool_calls:
+        arguments = json.loads(call['function']['arguments'] or '{}')
+        if arguments.get('ticker'):
+            tickers.append(arguments['ticker'])
+        tickers.extend(arguments.get('tickers') or [])
+    return tickers
+
+
+def _json_size(value):
+    return len(json.dumps(value))
+
+
+# Caches both model round trips of a turn. The plan cache maps a normalized question to the tool
+# calls the first completion chose, so a repeated question can run the tools straight away. The
+# answer cache maps the question plus the exact tool results to the second completion's text, so
+# the answer is reused as long as the underlying numbers have not changed.
+class ResponseCache:
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.plans = TTLCache(max_bytes=max_bytes // 2, sizeof=_json_size)
+        self.answers = TTLCache(max_bytes=max_bytes // 2, sizeof=_json_size)
+
+    def get_plan(self, prompt):
+        tool_calls = self.plans.get(normalize_prompt(prompt))
+        if tool_calls is None:
+            return None
+        # Fresh ids so the same call ids never show up twice in one history.
+        return [dict(call, id=f'call_{uuid.uuid4().hex[:24]}') for call in tool_calls]
+
+    # Follow-ups such as "and its RSI?" depend on earlier turns. Only plans whose tickers all appear
+    # in the question itself are safe to replay for the same wording later.
+    def put_plan(self, prompt, tool_calls):
+        key = normalize_prompt(prompt)
+        try:
+            tickers = _mentioned_tickers(tool_calls)
+        except ValueError:
+            return
+        words = set(re.findall(r'[\w.-]+', key))
+        if tickers and all(ticker.lower() in words for ticker in tickers):
+            self.plans.put(key, [dict(call) for call in tool_calls], ttl=market_ttl())
+
+    # The byte budget only measures answers, so keys hold digests of the results rather than the
+    # results themselves. Charts are left out: the model only ever sees that one was shown.
+    def _answer_key(self, prompt, results):
+        return (normalize_prompt(prompt),) + tuple(
+            (result.name, None if result.name == 'plot_stock_price' or result.content is None
+             else hashlib.blake2b(result.content.encode(), digest_size=16).hexdigest())
+            for result in results
+        )
+
+    def get_answer(self, prompt, results):
+        return self.answers.get(self._answer_key(prompt, results))
+
+    def put_answer(self, prompt, results, answer):
+        if answer and not any(result.error for result in results):
+            self.answers.put(self._answer_key(prompt, results), answer, ttl=market_ttl())
+
+    def stats(self):
+        return {'plans': self.plans.stats(), 'answers': self.answers.stats()}
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,151 @@
+import json
+import re
+import uuid
+
+
+# Keyword patterns for the questions simple enough to answer without the model, mapped to the
+# single-ticker tool and its batch counterpart.
+INTENTS = [
+    ('price', re.compile(r'\b(price|trading at|trade at|quote|worth|cost)\b'), 'get_stock_price', 'get_stock_price_batch'),
+    ('sma', re.compile(r'\b(sma|simple moving average)\b'), 'calculate_SMA', 'calculate_SMA_batch'),
+    ('ema', re.compile(r'\b(ema|exponential moving average)\b'), 'calculate_EMA', 'calculate_EMA_batch'),
+    ('rsi', re.compile(r'\b(rsi|relative strength)\b'), 'calculate_RSI', 'calculate_RSI_batch'),
+    ('macd', re.compile(r'\bmacd\b'), 'calculate_MACD', 'calculate_MACD_batch'),
+    ('plot', re.compile(r'\b(plot|chart|graph)\b'), 'plot_stock_price', None),
+]
+
+# Words that ask for judgement or explanation rather than a number, these always go to the model.
+NEEDS_MODEL = re.compile(r'\b(why|should|buy|sell|hold|recommend|predict|forecast|explain|news|think|better|worse|compare|vs|versus|if|when|which|screen|scan|find|oversold|overbought|backtest|strategy|worked)\b')
+
+# Upper-case words that look like tickers but are not.
+NOT_TICKERS = {'A', 'I', 'SMA', 'EMA', 'RSI', 'MACD', 'PRICE', 'PLOT', 'OF', 'FOR', 'AND', 'THE', 'IS', 'US', 'USD', 'EPS', 'ETF', 'CEO', 'AI'}
+TICKER = re.compile(r'(?<![\w$])\$?([A-Z]{1,5}(?:\.[A-Z])?)(?![\w.])')
+RENAMED = {'FB': 'META'}
+
+# "20", "50-day", "SMA(20)", "20d", "20days".
+WINDOW = re.compile(r'(?<![\w.])(\d{1,3})(?=\b(?!\.\d)|d\b|days?\b)')
+
+MAX_WORDS = 16
+
+# Bar sizes and time spans other than the tools' default year of daily bars are left to the model.
+TIMEFRAME = re.compile(r'\b(intraday|minutes?|mins?|hourly|hours?|weekly|weeks?|monthly|months?|quarterly|ytd|\d+\s?(?:m|h|wk|mo|y))\b')
+
+
+def extract_tickers(prompt):
+    tickers = [RENAMED.get(ticker, ticker) for ticker in TICKER.findall(prompt) if ticker not in NOT_TICKERS]
+    return list(dict.fromkeys(tickers))
+
+
+def _tool_call(name, arguments):
+    return {'id': f'call_{uuid.uuid4().hex[:24]}', 'type': 'function',
+            'function': {'name': name, 'arguments': json.dumps(arguments)}}
+
+
+# Resolves simple indicator questions ("price of MSFT", "50-day SMA of AAPL", "RSI for NVDA and AMD",
+# "plot TSLA") straight to tool calls in the same shape the model produces. Returns None whenever the
+# question is not clearly one of those, so the caller falls back to the model.
+def route(prompt, functions):
+    text = prompt.lower()
+    # Years and dates ask about the past, the tools only know the latest values.
+    if len(prompt.split()) > MAX_WORDS or NEEDS_MODEL.search(text) or TIMEFRAME.search(text) or re.search(r'\d{4}|\d+[/-]\d+', text):
+        return None
+
+    tickers = extract_tickers(prompt)
+    intents = [intent for intent in INTENTS if intent[1].search(text)]
+    if not tickers or not intents:
+        return None
+
+    # SMA and EMA need exactly one window, anything else is left to the model.
+    windows = {int(number) for number in WINDOW.findall(text)}
+    if any(intent[0] in ('sma', 'ema') for intent in intents):
+        if len(windows) != 1:
+            return None
+    elif windows:
+        return None
+    window = next(iter(windows), None)
+
+    schemas = {function['name']: function for function in functions}
+    tool_calls = []
+    for _, _, single, batch in intents:
+        if len(tickers) > 1 and batch is not None:
+            calls = [(batch, {'tickers': tickers})]
+        else:
+            calls = [(single, {'ticker': ticker}) for ticker in tickers]
+        for name, arguments in calls:
+            schema = schemas.get(name)
+            if schema is None:
+                return None
+            if 'window' in schema['parameters']['properties']:
+                arguments['window'] = window
+            if any(arguments.get(required) is None for required in schema['parameters']['required']):
+                return None
+            tool_calls.append(_tool_call(name, arguments))
+    return tool_calls
+
+
+def _number(value):
+    return 'n/a' if value is None or value != value else f'{value:,.2f}'
+
+
+def _rsi_zone(value):
+    if value is None or value != value:
+        return ''
+    return ' (overbought)' if value > 70 else ' (oversold)' if value < 30 else ' (neutral)'
+
+
+def _macd_line(ticker, values):
+    macd, signal, histogram = values
+    trend = '' if histogram is None or histogram != histogram else ' (bullish)' if histogram > 0 else ' (bearish)'
+    return f'MACD for {ticker}: MACD {_number(macd)}, signal {_number(signal)}, histogram {_number(histogram)}{trend}.'
+
+
+def _render(name, arguments, content):
+    window = arguments.get('window')
+    if name == 'get_stock_price':
+        return f"{arguments['ticker']} last traded at ${_number(float(content))}."
+    if name in ('calculate_SMA', 'calculate_EMA'):
+        return f"The {window}-day {name[-3:]} of {arguments['ticker']} is {_number(float(content))}."
+    if name == 'calculate_RSI':
+        value = float(content)
+        return f"The 14-day RSI of {arguments['ticker']} is {_number(value)}{_rsi_zone(value)}."
+    if name == 'calculate_MACD':
+        return _macd_line(arguments['ticker'], [float(value) for value in content.split(',')])
+
+    values = json.loads(content)
+    if name == 'get_stock_price_batch':
+        return '\n'.join(f'{ticker} last traded at ${_number(value)}.' for ticker, value in values.items())
+    if name in ('calculate_SMA_batch', 'calculate_EMA_batch'):
+        return '\n'.join(f'The {window}-day {name[10:13]} of {ticker} is {_number(value)}.' for ticker, value in values.items())
+    if name == 'calculate_RSI_batch':
+        return '\n'.join(f'The 14-day RSI of {ticker} is {_number(value)}{_rsi_zone(value)}.' for ticker, value in values.items())
+    if name == 'calculate_MACD_batch':
+        return '\n'.join(_macd_line(ticker, value) for ticker, value in values.items())
+    return None
+
+
+# Batch tools report tickers without data as null, the single-ticker tools return nan.
+def _missing(name, content):
+    if content is None or name == 'plot_stock_price':
+        return False
+    if not name.endswith('_batch'):
+        return any(value != value for value in map(float, content.split(',')))
+    return any(value is None or isinstance(value, list) and None in value for value in json.loads(content).values())
+
+
+# Templates only fit complete results: an unknown symbol or a window longer than the history is
+# left to the model to explain.
+def has_missing_values(results):
+    return any(_missing(result.name, result.content) for result in results)
+
+
+# Formats the results of routed tool calls from fixed templates instead of a second completion.
+# Charts have no text, so a plot-only question returns None.
+def render_answer(tool_calls, results):
+    lines = []
+    for call, result in zip(tool_calls, results):
+        if result.content is None or result.name == 'plot_stock_price':
+            continue
+        line = _render(result.name, json.loads(call['function']['arguments']), result.content)
+        if line:
+            lines.append(line)
+    return '\n'.join(lines) or None
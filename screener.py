@@ -0,0 +1,208 @@
+import contextvars
+import csv
+import os
+import re
+
+import numpy as np
+
+from indicators import compute_indicators
+from market_data import get_close_matrix
+from tracing import span
+
+
+# Universes are plain text files of tickers (one per line, # starts a comment) in UNIVERSE_DIR.
+UNIVERSE_DIR = os.environ.get('UNIVERSE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'universes'))
+# Keyed by the normalized name (see _universe_name): "the S&P 500 index" -> "sp500".
+UNIVERSE_ALIASES = {'sp': 'sp500', 'sandp': 'sp500', 'sandp500': 'sp500', 'spx': 'sp500', 'nasdaq': 'nasdaq100',
+                    'ndx': 'nasdaq100', 'dow': 'dow30', 'dowjones': 'dow30', 'dowjonesindustrialaverage': 'dow30',
+                    'djia': 'dow30'}
+
+# The current session's uploaded watchlist, used for universe="watchlist". Tool calls run in a copy
+# of the caller's context (see dispatch.py), so main.py only has to set it before running the turn.
+watchlist = contextvars.ContextVar('watchlist', default=())
+
+# "RSI < 30", "price above SMA(200)", "50-day EMA crosses above 200-day EMA", "MACD > signal".
+OPERAND = r'(?:price|close|rsi|macd|signal|histogram|(?:sma|ema)\(\d+\)|-?\d+(?:\.\d+)?)'
+COMPARISON = r'<=|>=|<|>|above|below|crosses above|crosses below'
+CLAUSE = re.compile(rf'({OPERAND})\s*({COMPARISON})\s*({OPERAND})')
+SYNTAX = ('conditions are comparisons joined by "and"/"or", e.g. "RSI < 30 and price above SMA(200)"; '
+          'operands: price, RSI, MACD, signal, histogram, SMA(n), EMA(n) or a number; '
+          'comparisons: <, >, <=, >=, above, below, crosses above, crosses below')
+
+TICKER = re.compile(r'[A-Za-z]{1,5}(?:[.-][A-Za-z]{1,2})?')
+WATCHLIST_HEADERS = ('symbol', 'symbols', 'ticker', 'tickers')
+
+
+# Tickers from an uploaded watchlist: a plain list separated by commas, whitespace or newlines, or a
+# CSV table, of which the symbol/ticker column (the first column without such a header) is read.
+def parse_watchlist(text):
+    rows = [[cell.strip() for cell in row] for row in csv.reader(text.splitlines()) if any(cell.strip() for cell in row)]
+    header = [cell.lower() for cell in rows[0]] if rows else []
+    column = next((number for number, name in enumerate(header) if name in WATCHLIST_HEADERS), None)
+    if column is not None:
+        cells = [row[column] for row in rows[1:] if len(row) > column]
+    elif len(rows) > 1 and all(len(row) > 1 for row in rows) and \
+            not all(TICKER.fullmatch(cell) for row in rows for cell in row[1:] if cell):
+        # A table with other data next to the tickers; a first row in lower case is its header.
+        cells = [row[0] for row in (rows[1:] if not rows[0][0].isupper() else rows)]
+    else:
+        cells = re.split(r'[\s,;]+', text)
+    return list(dict.fromkeys(cell.upper().replace('.', '-') for cell in cells if TICKER.fullmatch(cell)))
+
+
+def _universe_name(universe):
+    name = re.sub(r'\b(?:the|index|stocks|universe)\b', '', universe.lower())
+    name = re.sub(r'[\s&.-]+', '', name)
+    return UNIVERSE_ALIASES.get(name, name)
+
+
+def load_universe(universe):
+    name = _universe_name(universe)
+    if name == 'watchlist':
+        tickers = list(watchlist.get())
+        if not tickers:
+            raise ValueError('No watchlist has been uploaded in this session.')
+        return tickers
+    path = os.path.join(UNIVERSE_DIR, f'{name}.txt')
+    if name and os.path.exists(path):
+        with open(path) as file:
+            return parse_watchlist(re.sub(r'#.*', '', file.read()))
+    # Anything else has to be an explicit list of upper-case tickers and nothing more.
+    tickers = [word for word in re.split(r'[\s,;]+', universe.strip()) if word and word != 'and']
+    if not tickers or not all(TICKER.fullmatch(ticker) and ticker.isupper() for ticker in tickers):
+        names = sorted(file[:-4] for file in os.listdir(UNIVERSE_DIR) if file.endswith('.txt'))
+        raise ValueError(f'Unknown universe: {universe}. Use one of {", ".join(names)}, watchlist or a list of tickers.')
+    return list(dict.fromkeys(ticker.replace('.', '-') for ticker in tickers))
+
+
+def _normalize(conditions):
+    text = ' '.join(conditions.lower().split())
+    text = re.sub(r'(\d+)[- ]?(?:day|period|d)\s+(sma|ema)', r'\2(\1)', text)        # 200-day SMA
+    text = re.sub(r'\b(sma|ema)\s*\(?\s*(\d+)\s*\)?', r'\1(\2)', text)                 # SMA 200, SMA( 200 )
+    text = re.sub(r'\brsi\s*\(\s*14\s*\)', 'rsi', text)
+    text = re.sub(r'\b(macd|signal) line\b', r'\1', text)
+    text = re.sub(r'\b(the|is|trades|trading|closes|closed|stock)\b\s*', '', text)
+    text = re.sub(r'\b(over|greater than|higher than)\b', 'above', text)
+    text = re.sub(r'\b(under|less than|lower than)\b', 'below', text)
+    text = re.sub(r'\bcrosses (?:over|above)\b', 'crosses above', text)
+    text = re.sub(r'\bcrosses (?:under|below)\b', 'crosses below', text)
+    return text
+
+
+# Parses conditions into alternatives ("or") of clause lists ("and"), each clause (left, comparison, right).
+def parse_conditions(conditions):
+    alternatives = []
+    for alternative in re.split(r'\bor\b|\|\|', _normalize(conditions)):
+        clauses = []
+        for text in re.split(r'\band\b|&&|&|,', alternative):
+            text = text.strip()
+            if not text:
+                continue
+            # "above SMA(200)" is about the price.
+            if re.match(rf'(?:{COMPARISON})', text):
+                text = 'price ' + text
+            match = CLAUSE.fullmatch(text)
+            if match is None:
+                raise ValueError(f'Cannot read condition "{text}": {SYNTAX}')
+            clauses.append(match.groups())
+        if clauses:
+            alternatives.append(clauses)
+    if not alternatives:
+        raise ValueError(f'No conditions given: {SYNTAX}')
+    return alternatives
+
+
+def _windows(alternatives, kind):
+    return sorted({int(operand[4:-1]) for clauses in alternatives for clause in clauses
+                   for operand in (clause[0], clause[2]) if operand.startswith(kind + '(')})
+
+
+# Indicators for all tickers at once; only the last two bars are needed to evaluate the conditions.
+def _tails(close, sma_windows, ema_windows):
+    result = compute_indicators(close, sma_windows=sma_windows, ema_windows=ema_windows)
+    tails = {name: result[name][-2:] for name in ('close', 'rsi', 'macd', 'signal', 'histogram')}
+    tails.update({f'sma({window})': result['sma'][window][-2:] for window in sma_windows})
+    tails.update({f'ema({window})': result['ema'][window][-2:] for window in ema_windows})
+    return tails
+
+
+def _operand(tails, operand):
+    name = 'close' if operand == 'price' else operand
+    if name in tails:
+        return tails[name]
+    return np.full(tails['close'].shape, float(operand))
+
+
+# Evaluates one clause on the last bar of every ticker. The score is how far past the threshold the
+# ticker is, relative to the threshold, so "RSI < 30" ranks the most oversold first.
+def _evaluate(tails, clause):
+    left, comparison, right = _operand(tails, clause[0]), clause[1], _operand(tails, clause[2])
+    with np.errstate(invalid='ignore'):
+        if comparison in ('<', 'below'):
+            passed = left[-1] < right[-1]
+        elif comparison in ('>', 'above'):
+            passed = left[-1] > right[-1]
+        elif comparison == '<=':
+            passed = left[-1] <= right[-1]
+        elif comparison == '>=':
+            passed = left[-1] >= right[-1]
+        elif comparison == 'crosses above':
+            passed = (left[-1] > right[-1]) & (left[-2] <= right[-2])
+        else:
+            passed = (left[-1] < right[-1]) & (left[-2] >= right[-2])
+        scale = np.abs(right[-1])
+        margin = (left[-1] - right[-1]) / np.where(scale > 0, scale, 1.0)
+    if comparison in ('<', '<=', 'below', 'crosses below'):
+        margin = -margin
+    return passed, np.nan_to_num(margin, nan=0.0)
+
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+# Scans a universe for tickers meeting the conditions. All histories come from one bulk download,
+# the indicators are computed column-wise over the whole price matrix, and matches are ranked by score.
+def screen(universe, conditions, limit=10):
+    alternatives = parse_conditions(conditions)
+    tickers = load_universe(universe)
+    sma_windows = _windows(alternatives, 'sma')
+    ema_windows = _windows(alternatives, 'ema')
+    # A year of daily bars covers SMA(200); longer windows need a longer history.
+    period = '1y' if max(sma_windows + ema_windows, default=0) <= 200 else '5y'
+
+    close = get_close_matrix(tickers, period=period)
+    close = close.loc[:, close.notna().any()]
+    if close.empty or len(close) < 2:
+        raise ValueError(f'No price data for the {universe} universe.')
+
+    with span('indicators', bars=close.shape[0], columns=close.shape[1]):
+        tails = _tails(close.to_numpy(), sma_windows, ema_windows)
+
+    matched = np.zeros(close.shape[1], dtype=bool)
+    score = np.full(close.shape[1], -np.inf)
+    for clauses in alternatives:
+        results = [_evaluate(tails, clause) for clause in clauses]
+        passed = np.logical_and.reduce([result[0] for result in results])
+        score = np.where(passed, np.maximum(score, sum(result[1] for result in results)), score)
+        matched |= passed
+
+    shown = sorted({operand for clauses in alternatives for clause in clauses
+                    for operand in (clause[0], clause[2]) if operand in tails and operand not in ('close', 'price')})
+    order = np.flatnonzero(matched)[np.argsort(-score[matched], kind='stable')]
+    return {
+        'universe': universe,
+        'conditions': conditions,
+        'scanned': close.shape[1],
+        'without_data': len(tickers) - close.shape[1],
+        'matched': int(matched.sum()),
+        'matches': [
+            {
+                'ticker': close.columns[column],
+                'price': _round(tails['close'][-1, column]),
+                **{name.upper(): _round(tails[name][-1, column]) for name in shown},
+                'score': _round(score[column]),
+            }
+            for column in order[:limit]
+        ],
+    }
@@ -0,0 +1,79 @@
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Request coalescing: while a fetch for a key is in flight, other threads asking for the same key
+# wait for it and share its result (or its exception) instead of starting their own.
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.requests = 0
+        self.coalesced = 0
+
+    def _join(self, keys):
+        leading, following = [], {}
+        with self._lock:
+            for key in keys:
+                self.requests += 1
+                call = self._calls.get(key)
+                if call is None:
+                    self._calls[key] = _Call()
+                    leading.append(key)
+                else:
+                    following[key] = call
+                    self.coalesced += 1
+        return leading, following
+
+    def _finish(self, keys, results=None, error=None):
+        with self._lock:
+            calls = [self._calls.pop(key) for key in keys]
+        for key, call in zip(keys, calls):
+            if error is not None:
+                call.error = error
+            else:
+                call.result = results.get(key)
+            call.done.set()
+
+    @staticmethod
+    def _wait(call):
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key, fn):
+        return self.do_many([key], lambda keys: {keys[0]: fn()})[key]
+
+    # Like do() for several keys at once. `fn` receives only the keys nobody else is fetching yet and
+    # returns a dict of results for them; keys already in flight are waited for.
+    def do_many(self, keys, fn):
+        leading, following = self._join(keys)
+        results = {}
+        if leading:
+            try:
+                results = fn(leading)
+            except BaseException as e:
+                self._finish(leading, error=e)
+                raise
+            self._finish(leading, results)
+        for key, call in following.items():
+            results[key] = self._wait(call)
+        return {key: results.get(key) for key in keys}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+                'coalesced_rate': self.coalesced / self.requests if self.requests else 0.0,
+            }
@@ -0,0 +1,488 @@
+import json
+import re
+
+import numpy as np
+
+from backtest import backtest
+from charts import render_price_chart
+from indicators import compute_indicators
+from market_data import DAILY_INTERVALS, INTRADAY_MINUTES, default_period, get_close_matrix, get_history, normalize_interval
+from screener import load_universe, screen
+from tracing import span
+
+
+# The tools the model can call. They are pure functions of their arguments and the shared market data
+# caches: nothing here touches Streamlit, session state or the filesystem, so they can run concurrently
+# for any number of sessions.
+
+
+def get_stock_price(ticker):
+    return str(get_history(ticker).iloc[-1].Close)
+
+
+# Period and bar size of the indicator and plot tools: daily bars over a year unless asked otherwise.
+# Coarser bars are resampled from a cached finer series instead of downloaded again (see market_data).
+def _timeframe(interval=None, period=None):
+    interval = normalize_interval(interval or '1d')
+    if interval not in INTRADAY_MINUTES and interval not in DAILY_INTERVALS:
+        raise ValueError(f'Unsupported interval: {interval}')
+    return period or default_period(interval), interval
+
+
+# All indicator tools are thin views over one pass of the NumPy indicator engine.
+def _indicators(ticker, sma_windows=(), ema_windows=(), interval=None, period=None):
+    close = get_history(ticker, *_timeframe(interval, period)).Close.to_numpy()
+    with span('indicators', bars=len(close), columns=1):
+        return compute_indicators(close, sma_windows=sma_windows, ema_windows=ema_windows)
+
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+# A simple moving average (SMA) is an arithmetic moving average calculated by adding recent prices and then dividing that figure by the number of time periods in the calculation average.
+def calculate_SMA(ticker, window, interval=None, period=None):
+    return str(float(_indicators(ticker, sma_windows=(window,), interval=interval, period=period)['sma'][window][-1]))
+
+
+# The exponential moving average (EMA) is a technical chart indicator that tracks the price of an investment (like a stock or commodity) over time. The EMA is a type of weighted moving average (WMA) that gives more weighting or importance to recent price data.
+def calculate_EMA(ticker, window, interval=None, period=None):
+    return str(float(_indicators(ticker, ema_windows=(window,), interval=interval, period=period)['ema'][window][-1]))
+
+
+# The Relative Strength Index (RSI), developed by J. Welles Wilder, is a momentum oscillator that measures the speed and change of price movements. The RSI oscillates between zero and 100. Traditionally the RSI is considered overbought when above 70 and oversold when below 30.
+def calculate_RSI(ticker, interval=None, period=None):
+    return str(float(_indicators(ticker, interval=interval, period=period)['rsi'][-1]))
+
+
+# Moving average convergence/divergence (MACD, or MAC-D) is a trend-following momentum indicator that shows the relationship between two exponential moving averages (EMAs) of a security's price. The MACD line is calculated by subtracting the 26-period EMA from the 12-period EMA.
+def calculate_MACD(ticker, interval=None, period=None):
+    result = _indicators(ticker, interval=interval, period=period)
+    return f"{float(result['macd'][-1])}, {float(result['signal'][-1])}, {float(result['histogram'][-1])}"
+
+
+# Every indicator for one ticker from a single engine call, for "give me the technicals of AAPL" style questions.
+def get_indicator_summary(ticker, window=None, interval=None, period=None):
+    window = window or 20
+    result = _indicators(ticker, sma_windows=(window,), ema_windows=(window,), interval=interval, period=period)
+    return json.dumps({
+        'price': _round(result['close'][-1]),
+        f'SMA_{window}': _round(result['sma'][window][-1]),
+        f'EMA_{window}': _round(result['ema'][window][-1]),
+        'RSI': _round(result['rsi'][-1]),
+        'MACD': [_round(result['macd'][-1]), _round(result['signal'][-1]), _round(result['histogram'][-1])],
+    })
+
+
+_PERIOD_UNITS = {'d': 'Day', 'wk': 'Week', 'mo': 'Month', 'y': 'Year'}
+_BAR_NAMES = {'1d': 'Daily', '1wk': 'Weekly', '1mo': 'Monthly', '3mo': 'Quarterly'}
+
+
+# "AAPL Stock Price Over Last 5 Days (5-Minute Bars)"; None keeps the chart's default one-year title.
+def _chart_title(ticker, period, interval):
+    if (period, interval) == ('1y', '1d'):
+        return None
+    if period in ('ytd', 'max'):
+        covered = 'Year to Date' if period == 'ytd' else 'Over All Available History'
+    else:
+        count, unit = re.fullmatch(r'(\d+)(d|wk|mo|y)', period).groups()
+        covered = f'Over Last {_PERIOD_UNITS[unit]}' if count == '1' else f'Over Last {count} {_PERIOD_UNITS[unit]}s'
+    bars = _BAR_NAMES.get(interval) or f'{INTRADAY_MINUTES[interval]}-Minute'
+    return f'{ticker} Stock Price {covered} ({bars} Bars)'
+
+
+# Returns the chart as PNG bytes, rendered in memory and cached (see charts.py).
+def plot_stock_price(ticker, interval=None, period=None):
+    period, interval = _timeframe(interval, period)
+    data = get_history(ticker, period, interval)
+    if data.empty:
+        raise ValueError(f"No data available for {ticker}. Please check the stock symbol.")
+
+    return render_price_chart(ticker.upper(), data, title=_chart_title(ticker.upper(), period, interval))
+
+
+# Batch versions of the tools above. All tickers are fetched in one bulk download and the indicator
+# engine runs column-wise over a single wide matrix of close prices, so comparing N tickers costs
+# one function call instead of N. Results come back as one compact JSON object.
+def _batch_result(tickers, values):
+    return json.dumps({ticker: _round(value) for ticker, value in zip(tickers, values)})
+
+
+# When none of the tickers has data the matrix has no rows; one row of NaN makes every ticker null.
+def _close_matrix(tickers, period='1y', interval='1d'):
+    data = get_close_matrix(tickers, period, interval)
+    close = data.to_numpy() if len(data) else np.full((1, data.shape[1]), np.nan)
+    return data.columns, close
+
+
+def _batch_indicators(tickers, sma_windows=(), ema_windows=(), interval=None, period=None):
+    tickers, close = _close_matrix(tickers, *_timeframe(interval, period))
+    with span('indicators', bars=close.shape[0], columns=close.shape[1]):
+        return tickers, compute_indicators(close, sma_windows=sma_windows, ema_windows=ema_windows)
+
+
+def get_stock_price_batch(tickers):
+    tickers, close = _close_matrix(tickers)
+    return _batch_result(tickers, close[-1])
+
+
+def calculate_SMA_batch(tickers, window, interval=None, period=None):
+    tickers, result = _batch_indicators(tickers, sma_windows=(window,), interval=interval, period=period)
+    return _batch_result(tickers, result['sma'][window][-1])
+
+
+def calculate_EMA_batch(tickers, window, interval=None, period=None):
+    tickers, result = _batch_indicators(tickers, ema_windows=(window,), interval=interval, period=period)
+    return _batch_result(tickers, result['ema'][window][-1])
+
+
+def calculate_RSI_batch(tickers, interval=None, period=None):
+    tickers, result = _batch_indicators(tickers, interval=interval, period=period)
+    return _batch_result(tickers, result['rsi'][-1])
+
+
+def calculate_MACD_batch(tickers, interval=None, period=None):
+    tickers, result = _batch_indicators(tickers, interval=interval, period=period)
+    return json.dumps({
+        ticker: [_round(macd), _round(signal), _round(histogram)]
+        for ticker, macd, signal, histogram in zip(tickers, result['macd'][-1], result['signal'][-1], result['histogram'][-1])
+    })
+
+
+# Scans a whole universe (an index or the uploaded watchlist) for indicator conditions, see screener.py.
+def screen_stocks(universe, conditions, limit=10):
+    return json.dumps(screen(universe, conditions, limit=limit or 10))
+
+
+# Tests an indicator strategy over full histories, sweeping every combination of the given parameters
+# (see backtest.py). Parameters may come as a single value or a list.
+def backtest_strategy(strategy, tickers=None, universe=None, fast=None, slow=None, lower=None, upper=None, period=None):
+    if universe:
+        tickers = load_universe(universe)
+    if not tickers:
+        raise ValueError('Give the tickers or the universe to backtest.')
+    grid = {name: value if isinstance(value, list) else [value]
+            for name, value in (('fast', fast), ('slow', slow), ('lower', lower), ('upper', upper)) if value is not None}
+    return json.dumps(backtest(tickers, strategy, period=period or '5y', **grid))
+
+
+# Optional timeframe of the indicator and plot tools, shared by their schemas.
+INTERVAL_PARAMETER = {
+    'type': 'string',
+    'enum': ['1m', '2m', '5m', '15m', '30m', '1h', '90m', '1d', '1wk', '1mo', '3mo'],
+    'description': 'Bar size, for example "5m" for 5-minute bars or "1wk" for weekly bars. Defaults to daily bars ("1d").',
+}
+PERIOD_PARAMETER = {
+    'type': 'string',
+    'description': 'How far back to look, for example "5d", "1mo", "6mo", "1y", "5y", "ytd" or "max". Minute bars only go back 7 days for 1m and 60 days for the others, hourly bars 730 days. Defaults to a span suited to the bar size (1 year for daily bars).',
+}
+
+
+# function with list , list with inside a Dictionary
+functions = [
+    {
+        'name': 'get_stock_price',
+        'description': 'Gets the latest stock price given the ticker symbol of a company.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'ticker': {
+                    'type': 'string',
+                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
+                },
+            },
+            'required': ['ticker'],
+        },
+    },
+    {
+        'name': 'calculate_SMA',
+        'description': 'A simple moving average (SMA) is an arithmetic moving average calculated by adding recent prices and then dividing that figure by the number of time periods in the calculation average. Calculate SMA for a given stock ticket and a window',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'ticker': {
+                    'type': 'string',
+                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
+                },
+                'window': {
+                    'type': 'integer',
+                    'description': "The timeframe to consider when calculating the SMA."
+                },
+                'interval': INTERVAL_PARAMETER,
+                'period': PERIOD_PARAMETER,
+            },
+            'required': ['ticker', 'window'],
+        },
+    },
+    {
+        'name': 'calculate_EMA',
+        'description': 'The exponential moving average (EMA) is a technical chart indicator that tracks the price of an investment (like a stock or commodity) over time. The EMA is a type of weighted moving average (WMA) that gives more weighting or importance to recent price data. Calculate the EMA for a given stock ticker and a window.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'ticker': {
+                    'type': 'string',
+                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
+                },
+                'window': {
+                    'type': 'integer',
+                    'description': "The timeframe to consider when calculating the SMA."
+                },
+                'interval': INTERVAL_PARAMETER,
+                'period': PERIOD_PARAMETER,
+            },
+            'required': ['ticker', 'window'],
+        },
+    },
+    {
+        'name': 'calculate_RSI',
+        'description': 'The Relative Strength Index (RSI), developed by J. Welles Wilder, is a momentum oscillator that measures the speed and change of price movements. The RSI oscillates between zero and 100. Traditionally the RSI is considered overbought when above 70 and oversold when below 30. Calculate the RSI for a given stock ticker.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'ticker': {
+                    'type': 'string',
+                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
+                },
+                'interval': INTERVAL_PARAMETER,
+                'period': PERIOD_PARAMETER,
+            },
+            'required': ['ticker'],
+        },
+    },
+    {
+        'name': 'calculate_MACD',
+        'description': 'Moving average convergence/divergence (MACD, or MAC-D) is a trend-following momentum indicator that shows the relationship between two exponential moving averages (EMAs) of a security\'s price. The MACD line is calculated by subtracting the 26-period EMA from the 12-period EMA. Calculate the MACD for a given stock ticker.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'ticker': {
+                    'type': 'string',
+                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
+                },
+                'interval': INTERVAL_PARAMETER,
+                'period': PERIOD_PARAMETER,
+            },
+            'required': ['ticker'],
+        },
+    },
+    {
+        'name': 'get_indicator_summary',
+        'description': 'Gets the latest price, SMA, EMA, RSI and MACD of a stock in one call. Use this when the user asks for several indicators or a technical overview of one ticker.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'ticker': {
+                    'type': 'string',
+                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
+                },
+                'window': {
+                    'type': 'integer',
+                    'description': "The timeframe to consider when calculating the SMA and EMA. Defaults to 20."
+                },
+                'interval': INTERVAL_PARAMETER,
+                'period': PERIOD_PARAMETER,
+            },
+            'required': ['ticker'],
+        },
+    },
+    {
+        'name': 'plot_stock_price',
+        'description': 'It typically shows the current price, historical highs and lows, and trading volumes. Plot the stock price given the ticker symbol of a company, over the last year unless another period or bar size is asked for.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'ticker': {
+                    'type': 'string',
+                    'description' : 'The stock ticker symbol for a company (for example AAPL). Note: FB is renamed to META.',
+                },
+                'interval': INTERVAL_PARAMETER,
+                'period': PERIOD_PARAMETER,
+            },
+            'required': ['ticker'],
+        },
+    },
+    {
+        'name': 'get_stock_price_batch',
+        'description': 'Gets the latest stock price of several companies at once given their ticker symbols. Use this instead of get_stock_price when more than one ticker is involved.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'tickers': {
+                    'type': 'array',
+                    'items': {'type': 'string'},
+                    'description': 'The stock ticker symbols to compare (for example ["AAPL", "MSFT"]). Note: FB is renamed to META.',
+                },
+            },
+            'required': ['tickers'],
+        },
+    },
+    {
+        'name': 'calculate_SMA_batch',
+        'description': 'Calculate the SMA of several stock tickers at once for the same window. Use this instead of calculate_SMA when more than one ticker is involved.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'tickers': {
+                    'type': 'array',
+                    'items': {'type': 'string'},
+                    'description': 'The stock ticker symbols to compare (for example ["AAPL", "MSFT"]). Note: FB is renamed to META.',
+                },
+                'window': {
+                    'type': 'integer',
+                    'description': "The timeframe to consider when calculating the SMA."
+                },
+                'interval': INTERVAL_PARAMETER,
+                'period': PERIOD_PARAMETER,
+            },
+            'required': ['tickers', 'window'],
+        },
+    },
+    {
+        'name': 'calculate_EMA_batch',
+        'description': 'Calculate the EMA of several stock tickers at once for the same window. Use this instead of calculate_EMA when more than one ticker is involved.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'tickers': {
+                    'type': 'array',
+                    'items': {'type': 'string'},
+                    'description': 'The stock ticker symbols to compare (for example ["AAPL", "MSFT"]). Note: FB is renamed to META.',
+                },
+                'window': {
+                    'type': 'integer',
+                    'description': "The timeframe to consider when calculating the EMA."
+                },
+                'interval': INTERVAL_PARAMETER,
+                'period': PERIOD_PARAMETER,
+            },
+            'required': ['tickers', 'window'],
+        },
+    },
+    {
+        'name': 'calculate_RSI_batch',
+        'description': 'Calculate the RSI of several stock tickers at once. Use this instead of calculate_RSI when more than one ticker is involved.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'tickers': {
+                    'type': 'array',
+                    'items': {'type': 'string'},
+                    'description': 'The stock ticker symbols to compare (for example ["AAPL", "MSFT"]). Note: FB is renamed to META.',
+                },
+                'interval': INTERVAL_PARAMETER,
+                'period': PERIOD_PARAMETER,
+            },
+            'required': ['tickers'],
+        },
+    },
+    {
+        'name': 'calculate_MACD_batch',
+        'description': 'Calculate the MACD of several stock tickers at once. Returns the MACD line, signal line and histogram for each ticker. Use this instead of calculate_MACD when more than one ticker is involved.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'tickers': {
+                    'type': 'array',
+                    'items': {'type': 'string'},
+                    'description': 'The stock ticker symbols to compare (for example ["AAPL", "MSFT"]). Note: FB is renamed to META.',
+                },
+                'interval': INTERVAL_PARAMETER,
+                'period': PERIOD_PARAMETER,
+            },
+            'required': ['tickers'],
+        },
+    },
+    {
+        'name': 'screen_stocks',
+        'description': 'Scan a universe of stocks for tickers meeting technical indicator conditions and return the best matches, ranked. Use this for questions like "which S&P 500 stocks are oversold" or "find stocks above their 200-day SMA".',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'universe': {
+                    'type': 'string',
+                    'description': 'The stocks to scan: "sp500", "nasdaq100", "dow30", "watchlist" for the watchlist the user uploaded, or a comma separated list of ticker symbols.',
+                },
+                'conditions': {
+                    'type': 'string',
+                    'description': 'Comparisons joined by "and"/"or", for example "RSI < 30 and price above SMA(200)" or "EMA(50) crosses above EMA(200)". Operands: price, RSI, MACD, signal, histogram, SMA(n), EMA(n) or a number. Comparisons: <, >, <=, >=, above, below, crosses above, crosses below.',
+                },
+                'limit': {
+                    'type': 'integer',
+                    'description': 'The maximum number of matches to return (default 10).',
+                },
+            },
+            'required': ['universe', 'conditions'],
+        },
+    },
+    {
+        'name': 'backtest_strategy',
+        'description': 'Backtest a long-only technical strategy on the full price history of one or more stocks and return CAGR, maximum drawdown, Sharpe ratio and number of trades next to buy and hold. Give several values for a parameter to sweep them; the best combination per ticker is returned. Use this for questions like "would buying when MACD crosses the signal line have worked on AAPL?".',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'strategy': {
+                    'type': 'string',
+                    'enum': ['sma_cross', 'ema_cross', 'rsi_bands', 'macd_cross'],
+                    'description': 'sma_cross/ema_cross: hold while the fast moving average is above the slow one. rsi_bands: buy when RSI drops below lower, sell when it rises above upper. macd_cross: hold while the MACD line is above the signal line.',
+                },
+                'tickers': {
+                    'type': 'array',
+                    'items': {'type': 'string'},
+                    'description': 'The stock ticker symbols to test (for example ["AAPL"]). Note: FB is renamed to META.',
+                },
+                'universe': {
+                    'type': 'string',
+                    'description': 'Instead of tickers, a whole universe: "sp500", "nasdaq100", "dow30" or "watchlist".',
+                },
+                'fast': {
+                    'type': 'array',
+                    'items': {'type': 'integer'},
+                    'description': 'Fast moving average window(s) for sma_cross and ema_cross (default 50 for SMA, 12 for EMA).',
+                },
+                'slow': {
+                    'type': 'array',
+                    'items': {'type': 'integer'},
+                    'description': 'Slow moving average window(s) for sma_cross and ema_cross (default 200 for SMA, 26 for EMA).',
+                },
+                'lower': {
+                    'type': 'array',
+                    'items': {'type': 'number'},
+                    'description': 'RSI level(s) to buy below for rsi_bands (default 30).',
+                },
+                'upper': {
+                    'type': 'array',
+                    'items': {'type': 'number'},
+                    'description': 'RSI level(s) to sell above for rsi_bands (default 70).',
+                },
+                'period': {
+                    'type': 'string',
+                    'description': 'How much history to test on, for example "1y", "5y", "10y" or "max" (default "5y").',
+                },
+            },
+            'required': ['strategy'],
+        },
+    },
+]
+
+
+
+available_function = {
+    'get_stock_price': get_stock_price,
+    'calculate_SMA': calculate_SMA,
+    'calculate_EMA': calculate_EMA,
+    'calculate_RSI': calculate_RSI,
+    'calculate_MACD': calculate_MACD,
+    'get_indicator_summary': get_indicator_summary,
+    'plot_stock_price': plot_stock_price,
+    'get_stock_price_batch': get_stock_price_batch,
+    'calculate_SMA_batch': calculate_SMA_batch,
+    'calculate_EMA_batch': calculate_EMA_batch,
+    'calculate_RSI_batch': calculate_RSI_batch,
+    'calculate_MACD_batch': calculate_MACD_batch,
+    'screen_stocks': screen_stocks,
+    'backtest_strategy': backtest_strategy,
+}
+
+# The same schemas in the tools API format, which lets the model request several calls in one response.
+tools = [{'type': 'function', 'function': function} for function in functions]
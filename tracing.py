@@ -0,0 +1,190 @@
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+
+
+# Per-stage timing of assistant turns. A turn opens a trace with `trace()`, code inside it opens
+# nested spans with `span()`: the first completion, tool argument parsing, history downloads,
+# indicator math, chart rendering, the second completion. Spans carry attributes such as token
+# counts and cache hit flags. Outside a trace `span()` does nothing, so the instrumented modules
+# cost nothing when tracing is not used (tools called directly, load test, benchmark).
+#
+# The root span of a finished trace stays with the caller (the debug panel keeps its own session's
+# turns); when TRACE_FILE is set the trace is also appended to that file: one span per line
+# (TRACE_FORMAT=jsonl) or one OTLP/JSON export request per line (TRACE_FORMAT=otlp), which the
+# OpenTelemetry collector's otlpjsonfile receiver can ingest.
+TRACE_FILE = os.environ.get('TRACE_FILE', '')
+TRACE_FORMAT = os.environ.get('TRACE_FORMAT', 'jsonl')
+SERVICE_NAME = 'financial-ai-stock-assistant'
+
+# The span new spans are children of. Tool calls run on the dispatcher pool, which copies the
+# context into its threads (see dispatch.py), so their spans land in the caller's trace.
+_current = contextvars.ContextVar('tracing_current', default=None)
+
+_write_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'attributes', 'start_ns', 'duration_ns', 'error', '_started')
+
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.duration_ns = None
+        self.error = None
+        self._started = time.perf_counter_ns()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def _end(self, error=None):
+        self.duration_ns = time.perf_counter_ns() - self._started
+        if error is not None:
+            self.error = f'{type(error).__name__}: {error}'
+        self.trace._add(self)
+
+    @property
+    def duration_ms(self):
+        return None if self.duration_ns is None else self.duration_ns / 1e6
+
+
+# Stands in for a span outside of a trace.
+class _NullSpan:
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _NullScope:
+    def __enter__(self):
+        return _NULL_SPAN
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _SpanScope:
+    __slots__ = ('span', '_token')
+
+    def __init__(self, span):
+        self.span = span
+
+    def __enter__(self):
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        _current.reset(self._token)
+        self.span._end(exc)
+        return False
+
+
+class Trace:
+    def __init__(self, name, attributes):
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self._lock = threading.Lock()
+        self.root = Span(self, name, None, attributes)
+
+    def _add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    # Spans in start order with their nesting depth, the root first.
+    def breakdown(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: (span.start_ns, span is not self.root))
+        depth = {None: -1}
+        rows = []
+        for span in spans:
+            depth[span.span_id] = depth.get(span.parent_id, 0) + 1
+            rows.append((depth[span.span_id], span))
+        return rows
+
+
+class _TraceScope(_SpanScope):
+    def __exit__(self, exc_type, exc, traceback):
+        super().__exit__(exc_type, exc, traceback)
+        if TRACE_FILE:
+            export(self.span.trace)
+        return False
+
+
+# Opens a trace for one turn; the root span is returned and can take attributes like any span.
+def trace(name, **attributes):
+    return _TraceScope(Trace(name, attributes).root)
+
+
+# Opens a child span of the current one, or does nothing outside a trace.
+def span(name, **attributes):
+    parent = _current.get()
+    if parent is None:
+        return _NULL_SCOPE
+    return _SpanScope(Span(parent.trace, name, parent.span_id, attributes))
+
+
+def _span_record(span):
+    return {
+        'trace_id': span.trace.trace_id,
+        'span_id': span.span_id,
+        'parent_id': span.parent_id,
+        'name': span.name,
+        'start': span.start_ns / 1e9,
+        'duration_ms': span.duration_ms,
+        'attributes': span.attributes,
+        'error': span.error,
+    }
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_span(span):
+    record = {
+        'traceId': span.trace.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': 1,
+        'startTimeUnixNano': str(span.start_ns),
+        'endTimeUnixNano': str(span.start_ns + span.duration_ns),
+        'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in span.attributes.items() if value is not None],
+        'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+    }
+    if span.parent_id:
+        record['parentSpanId'] = span.parent_id
+    return record
+
+
+def export(trace, path=None, format=None):
+    path = path or TRACE_FILE
+    format = format or TRACE_FORMAT
+    with trace._lock:
+        spans = list(trace.spans)
+    if format == 'otlp':
+        lines = [json.dumps({'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': [_otlp_span(span) for span in spans]}],
+        }]}, default=str)]
+    else:
+        lines = [json.dumps(_span_record(span), default=str) for span in spans]
+    with _write_lock, open(path, 'a') as file:
+        file.write(''.join(line + '\n' for line in lines))